@@ -0,0 +1,180 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Cache settings
+ASSET_CACHE_DIR = os.path.expanduser("~/.cache/skyforge/assets")
+MEMORY_CACHE_ENTRIES = 64  # Resized images kept in RAM
+DISK_CACHE_MAX_BYTES = 8 * 1024 * 1024  # 8 MB on the SD card
+MISSING_ASSET_RETRY = 3600  # Seconds before asking again for an asset that was not found
+
+
+def decode_asset(data, size):
+    """Decode downloaded PNG bytes into an RGBA image at the layout size"""
+    return Image.open(BytesIO(data)).convert("RGBA").resize(tuple(size))
+
+
+class AssetCache:
+    """Two-tier cache of resized RGBA images: in-memory LRU backed by a size-bounded disk store.
+
+    With an AssetPack, packed images are served straight from it ahead of both tiers.
+    """
+
+    def __init__(self, cache_dir=ASSET_CACHE_DIR, max_entries=MEMORY_CACHE_ENTRIES,
+                 max_disk_bytes=DISK_CACHE_MAX_BYTES, pack=None):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.pack = pack
+        self.stats = {"pack_hits": 0, "memory_hits": 0, "disk_hits": 0, "misses": 0}
+        self._memory = OrderedDict()
+        self._missing = {}
+        self._lock = threading.Lock()
+        self._disk_bytes = self._scan_disk()
+
+    def get(self, kind, code, size, fetch):
+        """Return the image for (kind, code, size), calling fetch() for raw PNG bytes on a full miss"""
+        key = (kind, code, tuple(size))
+        if self.pack is not None:
+            image = self.pack.get(*key)
+            if image is not None:
+                with self._lock:
+                    self.stats["pack_hits"] += 1
+                return image
+
+        with self._lock:
+            image = self._memory.get(key)
+            if image is not None:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return image
+            if time.time() - self._missing.get(key, 0) < MISSING_ASSET_RETRY:
+                return None
+
+        image = self._load_from_disk(key)
+        if image is not None:
+            with self._lock:
+                self.stats["disk_hits"] += 1
+                self._remember(key, image)
+            return image
+
+        with self._lock:
+            self.stats["misses"] += 1
+
+        data = fetch()
+        if data is None:
+            with self._lock:
+                self._missing[key] = time.time()
+            return None
+
+        image = decode_asset(data, key[2])
+        self._save_to_disk(key, image)
+        with self._lock:
+            self._missing.pop(key, None)
+            self._remember(key, image)
+        return image
+
+    def peek(self, kind, code, size):
+        """Return the image only if it is already packed or cached in memory or on disk; never fetches"""
+        key = (kind, code, tuple(size))
+        if self.pack is not None:
+            image = self.pack.get(*key)
+            if image is not None:
+                return image
+        with self._lock:
+            image = self._memory.get(key)
+            if image is not None:
+                self._memory.move_to_end(key)
+                return image
+
+        image = self._load_from_disk(key)
+        if image is not None:
+            with self._lock:
+                self._remember(key, image)
+        return image
+
+    def _remember(self, key, image):
+        """Insert into the memory LRU, evicting the least recently used entry"""
+        self._memory[key] = image
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _path_for(self, key):
+        kind, code, (width, height) = key
+        safe_code = "".join(c for c in code if c.isalnum() or c in "-_")
+        return os.path.join(self.cache_dir, kind, f"{safe_code}_{width}x{height}.png")
+
+    def _load_from_disk(self, key):
+        path = self._path_for(key)
+        try:
+            with Image.open(path) as stored:
+                image = stored.convert("RGBA")
+            os.utime(path)  # Mark as recently used for eviction
+            return image
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Discarding unreadable cached asset {path}: {e}")
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            if self._remove(path):
+                with self._lock:
+                    self._disk_bytes -= size
+            return None
+
+    def _save_to_disk(self, key, image):
+        path = self._path_for(key)
+        tmp_path = f"{path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            old_size = os.path.getsize(path) if os.path.exists(path) else 0
+            image.save(tmp_path, format="PNG")
+            os.replace(tmp_path, path)  # Atomic, so a power cut never leaves half a file
+            with self._lock:
+                self._disk_bytes += os.path.getsize(path) - old_size
+            self._evict_disk()
+        except OSError as e:
+            logger.warning(f"Could not write asset cache file {path}: {e}")
+
+    def _scan_disk(self):
+        return sum(size for _, size, _ in self._disk_entries())
+
+    def _disk_entries(self):
+        """Yield (path, size, mtime) for every cached file"""
+        if not os.path.isdir(self.cache_dir):
+            return
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+
+    def _evict_disk(self):
+        """Remove least recently used files until the store fits in max_disk_bytes"""
+        if self._disk_bytes <= self.max_disk_bytes:
+            return
+        entries = sorted(self._disk_entries(), key=lambda entry: entry[2])
+        for path, size, _ in entries:
+            if self._disk_bytes <= self.max_disk_bytes:
+                break
+            if self._remove(path):
+                with self._lock:
+                    self._disk_bytes -= size
+                logger.info(f"Evicted cached asset {path}")
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
@@ -0,0 +1,168 @@
+import os
+import json
+import mmap
+import struct
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from asset_cache import decode_asset
+
+logger = logging.getLogger(__name__)
+
+# Pack settings
+ASSET_PACK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets.pack")
+PACK_MAGIC = b"SKYPACK1"
+PACK_HEADER = struct.Struct("<8sI")  # Magic, index length
+PACK_ALIGN = 64  # Pixel data starts on a cache-line boundary
+FLAG_CODES_URL = "https://flagcdn.com/en/codes.json"
+# Every icon OpenWeatherMap uses, by day and night
+ICON_CODES = tuple(f"{number}{period}" for number in ("01", "02", "03", "04", "09", "10", "11", "13", "50")
+                   for period in "dn")
+BUILD_WORKERS = 8
+
+
+class AssetPack:
+    """Read-only, memory-mapped pack of pre-resized RGBA icons and flags.
+
+    Images are views straight onto the mapped file via Image.frombuffer: there
+    is no PNG decode, no resize and no pixel copy, and the kernel shares the
+    pages between processes.
+    """
+
+    def __init__(self, path=ASSET_PACK_PATH):
+        self.path = path
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, index_length = PACK_HEADER.unpack_from(self.map, 0)
+        if magic != PACK_MAGIC:
+            raise ValueError(f"{path} is not an asset pack")
+        index = json.loads(self.map[PACK_HEADER.size:PACK_HEADER.size + index_length])
+        self.data_offset = index["data_offset"]
+        self.entries = index["entries"]  # "kind/code/WxH" -> [offset, width, height]
+        self.view = memoryview(self.map)
+        self._images = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, kind, code, size):
+        """Return the packed image for (kind, code, size), or None if it is not in the pack"""
+        key = _entry_key(kind, code, size)
+        image = self._images.get(key)
+        if image is None:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            offset, width, height = entry
+            start = self.data_offset + offset
+            pixels = self.view[start:start + width * height * 4]
+            image = Image.frombuffer("RGBA", (width, height), pixels, "raw", "RGBA", 0, 1)
+            self._images[key] = image
+        return image
+
+
+def load_pack(path=ASSET_PACK_PATH):
+    """Open the asset pack if one has been built, or return None"""
+    if not os.path.exists(path):
+        return None
+    try:
+        pack = AssetPack(path)
+        logger.info(f"Asset pack {path}: {len(pack)} images")
+        return pack
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring asset pack {path}: {e}")
+        return None
+
+
+def write_pack(path, images):
+    """Write {(kind, code, size): RGBA image} as a pack file, atomically"""
+    entries = {}
+    chunks = []
+    offset = 0
+    for (kind, code, size), image in sorted(images.items()):
+        data = image.tobytes()
+        entries[_entry_key(kind, code, size)] = [offset, image.width, image.height]
+        chunks.append(data)
+        offset += len(data)
+
+    index = {"entries": entries, "data_offset": 0}
+    # The data offset is part of the index, so size the index with a placeholder first
+    encoded = json.dumps(index, separators=(",", ":")).encode()
+    data_offset = _align(PACK_HEADER.size + len(encoded) + 16)
+    index["data_offset"] = data_offset
+    encoded = json.dumps(index, separators=(",", ":")).encode()
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(PACK_HEADER.pack(PACK_MAGIC, len(encoded)))
+        f.write(encoded)
+        f.write(b"\0" * (data_offset - PACK_HEADER.size - len(encoded)))
+        for chunk in chunks:
+            f.write(chunk)
+    os.replace(tmp_path, path)
+    return offset
+
+
+def build_pack(path, data_client, workers=BUILD_WORKERS):
+    """Download every weather icon and country flag, resize them for the layout and pack them"""
+    from weather_service import FLAG_SIZE, FLAG_URL, ICON_SIZE, ICON_URL, WEEKLY_ICON_SIZE
+
+    try:
+        flag_codes = sorted(data_client.get_json("flag", FLAG_CODES_URL))
+    except Exception as e:
+        logger.error(f"Could not download the list of flags: {e}")
+        flag_codes = []
+
+    jobs = [("icon", code, size, ICON_URL.format(code=code)) for code in ICON_CODES
+            for size in (ICON_SIZE, WEEKLY_ICON_SIZE)]
+    jobs += [("flag", code, FLAG_SIZE, FLAG_URL.format(code=code)) for code in flag_codes]
+
+    def fetch(job):
+        kind, code, size, url = job
+        try:
+            data = data_client.get_bytes(kind, url)
+            if data is None:
+                logger.warning(f"{kind} {code} not found")
+                return job, None
+            return job, decode_asset(data, size)
+        except Exception as e:
+            logger.warning(f"Could not fetch {kind} {code}: {e}")
+            return job, None
+
+    images = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for (kind, code, size, _), image in executor.map(fetch, jobs):
+            if image is not None:
+                images[(kind, code, tuple(size))] = image
+
+    size = write_pack(path, images)
+    logger.info(f"Packed {len(images)} of {len(jobs)} images ({size / 1024:.0f} KB) into {path}")
+    return len(images), len(jobs)
+
+
+def _entry_key(kind, code, size):
+    return f"{kind}/{code}/{size[0]}x{size[1]}"
+
+
+def _align(offset):
+    return (offset + PACK_ALIGN - 1) // PACK_ALIGN * PACK_ALIGN
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from data_client import DataClient, ReplaySession
+    from weather_display import REQUEST_TIMEOUT
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Build the offline icon and flag pack")
+    parser.add_argument("--output", default=ASSET_PACK_PATH)
+    parser.add_argument("--workers", type=int, default=BUILD_WORKERS)
+    args = parser.parse_args()
+
+    fixtures = os.environ.get("SKYFORGE_HTTP_FIXTURES")
+    client = DataClient(REQUEST_TIMEOUT, session=ReplaySession.from_directory(fixtures) if fixtures else None)
+    packed, wanted = build_pack(args.output, client, workers=args.workers)
+    raise SystemExit(0 if packed == wanted and packed else 1)
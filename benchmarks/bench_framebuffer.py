@@ -0,0 +1,116 @@
+"""Compare the FrameBuffer RGB565 path against the driver's disp.image() path.
+
+Renders a sequence of one-minute clock ticks with the real layout and reports
+conversions per second and bytes sent to the display per frame.
+
+    python3 benchmarks/bench_framebuffer.py [--frames 120]
+"""
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fixtures import load_fonts  # noqa: E402
+from framebuffer import FrameBuffer  # noqa: E402
+from renderer import Renderer, WIDTH, HEIGHT  # noqa: E402
+
+
+def image_to_data(image):
+    """Conversion used by adafruit_rgb_display's image() when NumPy is available"""
+    data = np.array(image.convert("RGB")).astype("uint16")
+    color = ((data[:, :, 0] & 0xF8) << 8) | ((data[:, :, 1] & 0xFC) << 3) | (data[:, :, 2] >> 3)
+    return np.dstack(((color >> 8) & 0xFF, color & 0xFF)).flatten().tolist()
+
+
+class CountingDisplay:
+    """Stands in for the ST7789 and counts the bytes it is sent"""
+
+    width = WIDTH
+    height = HEIGHT
+
+    def __init__(self):
+        self.bytes_written = 0
+
+    def image(self, img, rotation=None, x=0, y=0):
+        self._block(x, y, x + img.width - 1, y + img.height - 1, bytes(image_to_data(img)))
+
+    def _block(self, x0, y0, x1, y1, data=None):
+        self.bytes_written += len(data)
+
+
+def widget_values(minute):
+    icon = Image.new("RGBA", (60, 60), (255, 200, 0, 255))
+    small_icon = Image.new("RGBA", (30, 30), (120, 120, 255, 255))
+    flag = Image.new("RGBA", (30, 20), (200, 0, 0, 255))
+    return {
+        "date": "17 OCTOBER 2026",
+        "day": "SATURDAY",
+        "clock": f"{10 + minute // 60:02d}:{minute % 60:02d}",
+        "location": ("ISTANBUL", "TURKEY"),
+        "flag": flag,
+        "conditions": ("LIGHT RAIN", "12.5°C", icon, ""),
+        "forecast": tuple((day, "12", small_icon) for day in ("Sat", "Sun", "Mon", "Tue", "Wed")),
+    }
+
+
+def bench_conversion(frame, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        image_to_data(frame)
+    legacy = repeats / (time.perf_counter() - start)
+
+    framebuffer = FrameBuffer(CountingDisplay(), WIDTH, HEIGHT)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        framebuffer.convert(frame)
+    vectorized = repeats / (time.perf_counter() - start)
+    return legacy, vectorized
+
+
+def bench_push(frames, fonts, framebuffer):
+    display = CountingDisplay()
+    renderer = Renderer(display, fonts, framebuffer=FrameBuffer(display, WIDTH, HEIGHT) if framebuffer else None)
+    for minute in range(frames):
+        renderer.render(widget_values(minute))
+        renderer.push()
+    return display.bytes_written / frames
+
+
+def bench_full_frames(frames, fonts):
+    """The pre-renderer path: the whole frame through disp.image() every tick"""
+    display = CountingDisplay()
+    renderer = Renderer(display, fonts)
+    for minute in range(frames):
+        renderer.render(widget_values(minute))
+        display.image(renderer.frame)
+        renderer.dirty = []
+    return display.bytes_written / frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=120, help="clock ticks to simulate")
+    parser.add_argument("--repeats", type=int, default=50, help="full-frame conversions to time")
+    args = parser.parse_args()
+
+    fonts = load_fonts()
+    renderer = Renderer(CountingDisplay(), fonts)
+    renderer.render(widget_values(0))
+
+    legacy, vectorized = bench_conversion(renderer.frame, args.repeats)
+    print(f"Full-frame conversions/s: disp.image() {legacy:8.1f}   FrameBuffer {vectorized:8.1f}"
+          f"   ({vectorized / legacy:.1f}x)")
+
+    full = bench_full_frames(args.frames, fonts)
+    dirty = bench_push(args.frames, fonts, framebuffer=False)
+    spans = bench_push(args.frames, fonts, framebuffer=True)
+    print(f"Bytes/frame: full disp.image() {full:9.0f}   dirty rects {dirty:8.0f}   row spans {spans:8.0f}")
+
+
+if __name__ == "__main__":
+    main()
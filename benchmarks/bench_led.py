@@ -0,0 +1,99 @@
+"""LED engine timing on a fake GPIO: wakeups per second and edge jitter per pattern.
+
+Also switches between every pair of patterns, at several points in the first
+one's cycle, and exits with status 1 if a pin the new pattern does not drive
+is left lit or dimmed.
+
+    python3 benchmarks/bench_led.py [--seconds 5]
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import led_patterns  # noqa: E402
+
+GREEN, RED = 17, 27
+# The original loop: blink_twice() sleeps 4 times per LED, plus one pause after each LED
+LEGACY_SLEEPS_PER_CYCLE = 10
+LEGACY_CYCLE_SECONDS = 2.3
+SWITCH_OFFSETS = (0.02, 0.91)  # Seconds into the first pattern, e.g. during each double-blink flash
+SETTLE_SECONDS = 0.02  # Time the engine gets to apply a switch
+
+
+def measure(pattern, seconds):
+    gpio = led_patterns.FakeGPIO()
+    engine = led_patterns.LedEngine(gpio)
+    engine.start(pattern)
+    time.sleep(seconds)
+    engine.stop()
+    lateness = sorted(engine.lateness) or [0.0]
+    return {
+        "wakeups_per_s": engine.wakeups / seconds,
+        "edges": engine.edges_applied,
+        "p50_ms": statistics.median(lateness) * 1000,
+        "p99_ms": lateness[int(len(lateness) * 0.99) - 1 if len(lateness) > 1 else 0] * 1000,
+        "max_ms": lateness[-1] * 1000,
+    }
+
+
+def stray_pins(gpio, pattern):
+    """Pins left on (or PWM left running) that pattern does not drive"""
+    driven = set(pattern.compile()[0])
+    running = {pwm.pin for pwm in gpio.pwms if pwm.running}
+    return sorted(pin for pin, level in gpio.levels.items() if pin not in driven and (level or pin in running))
+
+
+def check_switches(patterns):
+    """(from, to, offset, stray pins) for every switch that left a pin lit"""
+    failures = []
+    for first in patterns:
+        for second in patterns:
+            if first is second:
+                continue
+            for offset in SWITCH_OFFSETS:
+                gpio = led_patterns.FakeGPIO()
+                engine = led_patterns.LedEngine(gpio)
+                engine.start(first)
+                time.sleep(offset)
+                engine.set_pattern(second)
+                time.sleep(SETTLE_SECONDS)
+                stray = stray_pins(gpio, second)
+                engine.stop()
+                if stray:
+                    failures.append((first.name, second.name, offset, stray))
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=5.0, help="run time per pattern")
+    args = parser.parse_args()
+
+    patterns = [
+        led_patterns.double_blink(GREEN, RED),
+        led_patterns.heartbeat(GREEN),
+        led_patterns.blink(RED, 0.1, 0.1),
+        led_patterns.solid(GREEN),
+        led_patterns.dim(GREEN, 20),
+    ]
+    print(f"legacy loop:   {LEGACY_SLEEPS_PER_CYCLE / LEGACY_CYCLE_SECONDS:6.2f} wakeups/s")
+    print(f"{'pattern':14} {'wakeups/s':>9} {'edges':>6} {'p50 ms':>7} {'p99 ms':>7} {'max ms':>7}")
+    for pattern in patterns:
+        result = measure(pattern, args.seconds)
+        print(f"{pattern.name:14} {result['wakeups_per_s']:9.2f} {result['edges']:6d} "
+              f"{result['p50_ms']:7.3f} {result['p99_ms']:7.3f} {result['max_ms']:7.3f}")
+
+    failures = check_switches(patterns + [led_patterns.blink(RED), led_patterns.off(GREEN, RED)])
+    for first, second, offset, stray in failures:
+        print(f"switch {first} -> {second} at {offset:.2f} s left GPIO {', '.join(map(str, stray))} on")
+    if failures:
+        sys.exit(1)
+    print("Pattern switches leave no stray LEDs on")
+
+
+if __name__ == "__main__":
+    main()
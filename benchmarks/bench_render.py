@@ -0,0 +1,123 @@
+"""Per-stage frame time benchmark for the display pipeline, runnable on any Linux box.
+
+Drives the real fetch stage, renderer and framebuffer against recorded API
+responses and an in-memory display, with cold caches (fresh process state and
+an empty asset cache directory) and warm caches (steady-state minute ticks).
+Exits with status 1 when the mean frame time exceeds its budget.
+
+    python3 benchmarks/bench_render.py [--frames 30] [--latency 0.05]
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fixtures import api_routes, load_fonts  # noqa: E402
+from asset_cache import AssetCache  # noqa: E402
+from data_client import DataClient, ReplaySession  # noqa: E402
+from display_backend import MemoryDisplay  # noqa: E402
+from fetch_stage import FetchStage  # noqa: E402
+from framebuffer import FrameBuffer  # noqa: E402
+from renderer import Renderer, STAGES  # noqa: E402
+from text_cache import TextCache  # noqa: E402
+from weather_service import WeatherService, widget_values  # noqa: E402
+from weather_display import app_settings  # noqa: E402
+
+# Mean frame time budgets in milliseconds
+FRAME_BUDGETS_MS = {"cold": 400.0, "warm": 40.0}
+START_TIME = datetime(2026, 10, 17, 9, 0)
+
+
+class Pipeline:
+    """One display's worth of state: caches, fetch stage, renderer and display"""
+
+    def __init__(self, routes, fonts, cache_dir, latency):
+        self.session = ReplaySession(routes, latency=latency)
+        self.display = MemoryDisplay()
+        settings = app_settings()
+        client = DataClient(settings["request_timeout"], ttls=settings["ttls"], session=self.session)
+        self.service = WeatherService(client, AssetCache(cache_dir), "benchmark")
+        self.fetch_stage = FetchStage()
+        self.renderer = Renderer(self.display, fonts,
+                                 framebuffer=FrameBuffer(self.display, self.display.width, self.display.height),
+                                 text_cache=TextCache())
+
+    def frame(self, now):
+        """Produce one frame and return seconds spent per stage"""
+        start = time.perf_counter()
+        frame = self.service.fetch_frame(self.fetch_stage)
+        fetched = time.perf_counter()
+        self.renderer.render(widget_values(frame, now))
+        self.renderer.push()
+        timings = dict(self.renderer.timings, fetch=fetched - start)
+        timings["total"] = time.perf_counter() - start
+        return timings
+
+    def close(self):
+        self.fetch_stage.shutdown()
+
+
+def run_cold(frames, routes, fonts, latency):
+    samples = []
+    for i in range(frames):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            pipeline = Pipeline(routes, fonts, cache_dir, latency)
+            samples.append(pipeline.frame(START_TIME + timedelta(minutes=i)))
+            pipeline.close()
+    return samples
+
+
+def run_warm(frames, routes, fonts, latency):
+    with tempfile.TemporaryDirectory() as cache_dir:
+        pipeline = Pipeline(routes, fonts, cache_dir, latency)
+        pipeline.frame(START_TIME)  # Prime every cache
+        requests_before = pipeline.session.requests_made
+        samples = [pipeline.frame(START_TIME + timedelta(minutes=i + 1)) for i in range(frames)]
+        if pipeline.session.requests_made != requests_before:
+            print(f"warning: warm frames made {pipeline.session.requests_made - requests_before} HTTP requests")
+        pipeline.close()
+    return samples
+
+
+def report(name, samples):
+    columns = ("fetch",) + STAGES + ("total",)
+    means = {column: statistics.mean(sample[column] for sample in samples) * 1000 for column in columns}
+    print(f"{name:5} " + " ".join(f"{means[column]:8.2f}" for column in columns))
+    return means["total"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=30, help="frames measured per scenario")
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated seconds per HTTP request")
+    parser.add_argument("--cold-budget-ms", type=float, default=FRAME_BUDGETS_MS["cold"])
+    parser.add_argument("--warm-budget-ms", type=float, default=FRAME_BUDGETS_MS["warm"])
+    args = parser.parse_args()
+
+    routes = api_routes()
+    fonts = load_fonts()
+    budgets = {"cold": args.cold_budget_ms, "warm": args.warm_budget_ms}
+
+    print("mean ms " + " ".join(f"{column:>8}" for column in ("fetch",) + STAGES + ("total",)))
+    results = {
+        "cold": report("cold", run_cold(args.frames, routes, fonts, args.latency)),
+        "warm": report("warm", run_warm(args.frames, routes, fonts, args.latency)),
+    }
+
+    failed = False
+    for name, total in results.items():
+        if total > budgets[name]:
+            print(f"FAIL: {name} frame time {total:.2f} ms exceeds budget {budgets[name]:.2f} ms")
+            failed = True
+    if failed:
+        sys.exit(1)
+    print("All frame times within budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Time from process start to the first frame, for a first boot and for restarts.
+
+Starts weather_display.py in its startup profile mode (SKYFORGE_PROFILE_STARTUP=1)
+against recorded API responses and an in-memory display, with its caches in a
+temporary home directory. The first run has no snapshot and waits for a
+refresh; the runs after it restart from the snapshot the first one wrote.
+Exits with status 1 when the median restart exceeds the startup budget.
+
+    python3 benchmarks/bench_startup.py [--runs 5]
+"""
+import os
+import re
+import sys
+import json
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fixtures import REPO_DIR, FONT_PATH, api_routes  # noqa: E402
+from startup_profile import STARTUP_BUDGET  # noqa: E402
+
+REPORT = re.compile(r"First frame ([\d.]+) s after start \((.*)\)")
+CHILD = ("import weather_display; weather_display.WEATHER_API_KEY = 'bench'; "
+         f"weather_display.FONT_PATH = {FONT_PATH!r}; weather_display.main()")
+
+
+def write_fixtures(path):
+    """Recorded responses as a SKYFORGE_HTTP_FIXTURES directory"""
+    index = {}
+    for i, (url, (status, body, headers)) in enumerate(api_routes().items()):
+        with open(os.path.join(path, str(i)), "wb") as f:
+            f.write(body)
+        index[url] = {"file": str(i), "status": status, "headers": headers}
+    with open(os.path.join(path, "index.json"), "w") as f:
+        json.dump(index, f)
+
+
+def run_once(env):
+    """(seconds to the first frame, phase breakdown) from one profiled start"""
+    result = subprocess.run([sys.executable, "-c", CHILD], cwd=REPO_DIR, env=env, capture_output=True, text=True,
+                            timeout=60)
+    match = REPORT.search(result.stderr)
+    if match is None:
+        raise RuntimeError(f"No startup report (exit {result.returncode}):\n{result.stderr}")
+    return float(match.group(1)), match.group(2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="restarts measured after the first boot")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as home:
+        fixtures = os.path.join(home, "fixtures")
+        os.makedirs(fixtures)
+        write_fixtures(fixtures)
+        env = dict(os.environ, HOME=home, SKYFORGE_PROFILE_STARTUP="1", SKYFORGE_DISPLAY="memory",
+                   SKYFORGE_HTTP_FIXTURES=fixtures, SKYFORGE_RUN_DIR=home,
+                   SKYFORGE_METRICS_DIR=os.path.join(home, "no-metrics"))
+
+        seconds, phases = run_once(env)
+        print(f"first boot  {seconds * 1000:7.0f} ms  ({phases})")
+        restarts = []
+        for i in range(args.runs):
+            seconds, phases = run_once(env)
+            restarts.append(seconds)
+            print(f"restart {i + 1:<3} {seconds * 1000:7.0f} ms  ({phases})")
+
+    median = statistics.median(restarts)
+    print(f"median restart {median * 1000:.0f} ms (budget {STARTUP_BUDGET * 1000:.0f} ms)")
+    if median > STARTUP_BUDGET:
+        print("Startup over budget")
+        sys.exit(1)
+    print("Startup within budget")
+
+
+if __name__ == "__main__":
+    main()
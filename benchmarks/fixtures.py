@@ -0,0 +1,70 @@
+"""Shared fixtures for the benchmarks: fonts and recorded API responses"""
+import os
+import sys
+import json
+from io import BytesIO
+
+from PIL import Image, ImageDraw
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import renderer  # noqa: E402
+from weather_service import (  # noqa: E402
+    FLAG_URL, FORECAST_API_URL, ICON_URL, LOCATION_API_URL, WEATHER_API_URL,
+)
+
+FONT_PATH = os.path.join(REPO_DIR, "Orbitron-Bold.ttf")
+FORECAST_START = 1792224000  # A fixed epoch so every run renders the same forecast
+ICON_CODES = ("01d", "02d", "03d", "04d", "09d", "10d", "11d", "13d", "50d")
+
+
+def load_fonts():
+    return renderer.load_fonts(FONT_PATH)
+
+
+def _png(size, color):
+    image = Image.new("RGBA", size, (0, 0, 0, 0))
+    ImageDraw.Draw(image).ellipse((8, 8, size[0] - 8, size[1] - 8), fill=color)
+    buffer = BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _json(payload):
+    return (200, json.dumps(payload).encode(), {"Content-Type": "application/json"})
+
+
+def forecast_payload():
+    entries = []
+    for i in range(40):
+        entries.append({
+            "dt": FORECAST_START + i * 3 * 3600,
+            "main": {"temp": 10 + (i % 8) * 1.5, "temp_min": 8 + (i % 8), "temp_max": 12 + (i % 8),
+                     "humidity": 60 + i % 20, "pressure": 1010 + i % 7},
+            "weather": [{"id": 500, "description": "light rain", "icon": ICON_CODES[i % len(ICON_CODES)]}],
+            "pop": (i % 5) / 5,
+        })
+    return {"cod": "200", "cnt": 40, "list": entries,
+            "city": {"name": "Istanbul", "country": "TR", "timezone": 10800, "coord": {"lat": 41.01, "lon": 28.95}}}
+
+
+def api_routes():
+    """URL -> (status, body, headers) for every endpoint the display uses"""
+    routes = {
+        LOCATION_API_URL: _json({"status": "success", "city": "Istanbul", "country": "Turkey",
+                                 "countryCode": "TR", "lat": 41.01, "lon": 28.95, "timezone": "Europe/Istanbul",
+                                 "query": "203.0.113.7"}),
+        WEATHER_API_URL: _json({"id": 745044, "name": "Istanbul", "timezone": 10800,
+                                "coord": {"lat": 41.01, "lon": 28.95},
+                                "weather": [{"id": 500, "description": "light rain", "icon": "10d"}],
+                                "main": {"temp": 12.5, "humidity": 81, "pressure": 1012},
+                                "wind": {"speed": 4.1, "deg": 200},
+                                "sys": {"country": "TR", "sunrise": 1792213200, "sunset": 1792253400},
+                                "dt": 1792224000}),
+        FORECAST_API_URL: _json(forecast_payload()),
+        FLAG_URL.format(code="tr"): (200, _png((80, 53), (227, 10, 23, 255)), {"Content-Type": "image/png"}),
+    }
+    for code in ICON_CODES:
+        routes[ICON_URL.format(code=code)] = (200, _png((100, 100), (255, 200, 40, 255)), {"Content-Type": "image/png"})
+    return routes
@@ -0,0 +1,255 @@
+import os
+import json
+import time
+import logging
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from request_budget import BudgetExceeded
+
+logger = logging.getLogger(__name__)
+
+# Connection settings
+POOL_SIZE = 8  # Connections kept alive per host
+RETRY_TOTAL = 2
+RETRY_BACKOFF = 0.5  # Seconds, doubled on each retry
+RETRY_STATUSES = (500, 502, 503, 504)
+
+
+class DataClient:
+    """Single access point for every upstream endpoint: pooled keep-alive session,
+    per-endpoint TTL cache, conditional requests and hit/miss accounting.
+
+    Concurrent identical requests share one upstream call. With a RequestBudget
+    every upstream call must fit the host's budget; a call that does not, or
+    that the host rejects with 429, is answered from the expired cache entry
+    when there is one. JSON answered from the cache is a CachedResponse, so the
+    caller can tell it from a fresh fetch and how old it is.
+    """
+
+    def __init__(self, timeout, ttls=None, session=None, budget=None):
+        # Response TTLs in seconds per endpoint, from the app's cache settings. Endpoints without
+        # one (icons and flags, already cached resized by asset_cache) are not kept
+        self.ttls = dict(ttls or {})
+        self.timeout = timeout
+        self.session = session or self._create_session()
+        self.budget = budget
+        self._cache = {}
+        self._inflight = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _create_session(self):
+        retry = Retry(
+            total=RETRY_TOTAL,
+            backoff_factor=RETRY_BACKOFF,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset(["GET"]),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=retry)
+        session = requests.Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers.update({"User-Agent": "skyforge-weather-display"})
+        return session
+
+    def get_json(self, endpoint, url, params=None):
+        """Return the decoded JSON body, raising requests exceptions on failure"""
+        return self._get(endpoint, url, params, lambda response: response.json())
+
+    def get_bytes(self, endpoint, url, params=None):
+        """Return the raw body, or None if the server answers 404"""
+        try:
+            return self._get(endpoint, url, params, lambda response: response.content)
+        except requests.exceptions.HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                return None
+            raise
+
+    def _get(self, endpoint, url, params, decode):
+        key = (endpoint, url, tuple(sorted((params or {}).items())))
+        ttl = self.ttls.get(endpoint, 0)
+        now = time.time()
+        leader = False
+
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry and now - entry["fetched_at"] < ttl:
+                self._count(endpoint, "hits")
+                return _cached(entry)
+            call = self._inflight.get(key)
+            if call is None:
+                call = self._inflight[key] = _Call()
+                leader = True
+            else:
+                self._count(endpoint, "coalesced")
+
+        if not leader:
+            return call.result()  # The same request is already on its way upstream
+
+        try:
+            value = self._fetch(key, ttl, entry, now, decode)
+            call.set_result(value)
+            return value
+        except Exception as e:
+            call.set_error(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _fetch(self, key, ttl, entry, now, decode):
+        """Make the upstream call for a cache miss, within the request budget"""
+        endpoint, url, params = key
+        host = urlsplit(url).hostname
+        headers = {}
+        if entry:
+            if entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        try:
+            if self.budget is not None:
+                self.budget.take(host, endpoint)
+            response = self.session.get(url, params=dict(params) or None, headers=headers, timeout=self.timeout)
+            if response.status_code == 304 and entry:
+                with self._lock:
+                    entry["fetched_at"] = now
+                    self._count(endpoint, "not_modified")
+                return entry["value"]
+            if response.status_code == 429 and self.budget is not None:
+                self.budget.exhaust(host)
+            response.raise_for_status()
+            value = decode(response)
+        except (BudgetExceeded, requests.exceptions.HTTPError) as e:
+            throttled = isinstance(e, BudgetExceeded) or (e.response is not None and e.response.status_code == 429)
+            with self._lock:
+                self._count(endpoint, "over_budget" if throttled else "errors")
+            if throttled and entry:
+                logger.warning(f"Serving expired {endpoint} data: {e}")
+                return _cached(entry, expired=True)
+            raise
+        except Exception:
+            with self._lock:
+                self._count(endpoint, "errors")
+            raise
+
+        with self._lock:
+            self._count(endpoint, "misses")
+            if ttl > 0:
+                self._cache[key] = {
+                    "value": value,
+                    "fetched_at": now,
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                }
+        return value
+
+    def _count(self, endpoint, counter):
+        stats = self._stats.setdefault(endpoint, {
+            "hits": 0, "not_modified": 0, "misses": 0, "errors": 0, "coalesced": 0, "over_budget": 0,
+        })
+        stats[counter] += 1
+
+    def stats(self):
+        """Per-endpoint counters plus hit ratio (304 revalidations and coalesced calls count as hits)"""
+        with self._lock:
+            report = {}
+            for endpoint, counters in self._stats.items():
+                served = counters["hits"] + counters["not_modified"] + counters["coalesced"]
+                total = served + counters["misses"]
+                report[endpoint] = dict(counters, hit_ratio=served / total if total else 0.0)
+            return report
+
+    def log_stats(self):
+        for endpoint, counters in sorted(self.stats().items()):
+            logger.info(
+                f"{endpoint}: hit ratio {counters['hit_ratio']:.0%} "
+                f"({counters['hits']} hits, {counters['not_modified']} not modified, "
+                f"{counters['misses']} misses, {counters['errors']} errors, "
+                f"{counters['coalesced']} coalesced, {counters['over_budget']} over budget)"
+            )
+
+
+class CachedResponse(dict):
+    """A JSON body answered from the cache: fetched_at is when it came from upstream, and expired
+    is True when it was served past its TTL because the host was over budget or throttling"""
+
+    def __init__(self, value, fetched_at, expired=False):
+        super().__init__(value)
+        self.fetched_at = fetched_at
+        self.expired = expired
+
+
+def _cached(entry, expired=False):
+    if isinstance(entry["value"], dict):
+        return CachedResponse(entry["value"], entry["fetched_at"], expired)
+    return entry["value"]
+
+
+class _Call:
+    """One upstream request that concurrent identical requests wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+    def set_result(self, value):
+        self.value = value
+        self.done.set()
+
+    def set_error(self, error):
+        self.error = error
+        self.done.set()
+
+    def result(self):
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+class ReplaySession:
+    """Stand-in for requests.Session that answers from recorded responses.
+
+    routes maps a URL without query string to (status, body bytes, headers).
+    Unknown URLs answer 404. An optional latency simulates the network.
+    """
+
+    def __init__(self, routes, latency=0.0):
+        self.routes = routes
+        self.latency = latency
+        self.requests_made = 0
+
+    @classmethod
+    def from_directory(cls, path, latency=0.0):
+        """Load routes from index.json ({url: {"file": name, "headers": {...}}}) in path"""
+        with open(os.path.join(path, "index.json")) as f:
+            index = json.load(f)
+        routes = {}
+        for url, entry in index.items():
+            with open(os.path.join(path, entry["file"]), "rb") as body:
+                routes[url] = (entry.get("status", 200), body.read(), entry.get("headers", {}))
+        return cls(routes, latency)
+
+    def get(self, url, params=None, headers=None, timeout=None):
+        self.requests_made += 1
+        if self.latency:
+            time.sleep(self.latency)
+        status, body, response_headers = self.routes.get(url, (404, b"", {}))
+        response = requests.Response()
+        response.status_code = status
+        response._content = body
+        response.headers.update(response_headers)
+        response.url = url
+        return response
+
+    def close(self):
+        pass
@@ -0,0 +1,427 @@
+import time
+import signal
+import logging
+import threading
+from datetime import datetime
+
+from asset_cache import AssetCache
+from asset_pack import load_pack
+from data_client import DataClient, ReplaySession
+from request_budget import RequestBudget
+from display_backend import create_display
+from fetch_stage import FetchStage
+from location_cache import LocationCache
+from metrics import Metrics, SpanTrace, METRICS_PORT, TRACE_PATH, textfile_path
+from pages import PageCache, PageData, PAGE_CACHE_ENTRIES
+from renderer import Renderer, load_fonts
+from framebuffer import FrameBuffer
+from text_cache import TextCache
+from status_bus import StatusPublisher, STATE_OK, STATE_STALE, STATE_ERROR
+from weather_service import WeatherService, DATA_AGE_VISIBLE, widget_values
+from weather_store import WeatherStore, SNAPSHOT_PATH
+from weather_history import WeatherHistory, HISTORY_PATH
+from screen import Screen
+from tick_scheduler import FrameGate, MinuteTicker
+from render_pipeline import CardSlide, RenderPipeline
+
+logger = logging.getLogger(__name__)
+
+# Main loop
+MAX_ERRORS = 3
+STATS_LOG_INTERVAL = 60  # Frames between cache statistics reports
+FIRST_FETCH_WAIT = 15  # Seconds to wait for data on a first boot without a snapshot
+STATE_SEVERITY = (STATE_OK, STATE_STALE, STATE_ERROR)  # The worst screen's state is published
+
+
+def stop_on_sigterm():
+    """Stop on SIGTERM from the supervisor or systemd as on Ctrl-C, so buffered history is written out"""
+    signal.signal(signal.SIGTERM, _sigterm_handler)
+
+
+def _sigterm_handler(signum, frame):
+    logger.info(f"Received signal {signum}, stopping")
+    raise SystemExit(0)
+
+
+class Site:
+    """Everything fetched and kept for one location, shared by the screens showing it"""
+
+    def __init__(self, weather_store, history, page_data):
+        self.weather_store = weather_store
+        self.history = history
+        self.page_data = page_data
+
+
+class DisplayApp:
+    """The weather app: services shared by every display, a screen per display, and the main loop.
+
+    Constructing it only keeps the settings, which weather_display.py defines
+    and passes in. start() builds everything, with the panels initializing on
+    their own threads meanwhile (unless a display is passed in); run() shows
+    the first frame, then loops until interrupted. This class drives a single
+    display; multi_display.py overrides open_displays() and add_screens().
+    """
+
+    def __init__(self, api_key, *, mode, pipeline_fps, pages, page_seconds, history_hours, font_path,
+                 location_override, ttls, location_ttl, request_timeout, api_quota_share, display=None,
+                 backend="st7789", output="frame.png", http_fixtures=None, profile=None, metrics_name="display"):
+        self.api_key = api_key
+        self.display = display
+        self.backend = backend
+        self.output = output
+        self.http_fixtures = http_fixtures
+        self.mode = mode
+        self.pipeline_fps = pipeline_fps
+        self.pages = pages if mode != "pipeline" else ("main",)
+        self.page_seconds = page_seconds
+        self.history_hours = history_hours
+        self.font_path = font_path
+        self.location_override = location_override
+        self.ttls = ttls
+        self.location_ttl = location_ttl
+        self.request_timeout = request_timeout
+        self.api_quota_share = api_quota_share
+        self.profile = profile  # StartupProfile, marked at each phase up to the first frame
+        self.metrics_name = metrics_name  # Of the textfile, skyforge_<name>.prom
+        self.started = False
+        self.sites = []
+        self.screens = []
+        self.pipeline = None  # RenderPipeline, in pipeline mode
+        self.frame_count = 0
+        self.error_count = 0
+
+    def start(self):
+        """Build every component; nothing is drawn or fetched yet"""
+        # The panels' reset sequences run while fonts, caches and the snapshots load
+        self.open_displays()
+
+        # Every HTTP request goes through one pooled, caching client, within a per-host budget
+        # that survives restarts
+        self.request_budget = RequestBudget(share=self.api_quota_share)
+        self.data_client = DataClient(
+            timeout=self.request_timeout,
+            ttls=self.ttls,
+            session=ReplaySession.from_directory(self.http_fixtures) if self.http_fixtures else None,
+            budget=self.request_budget,
+        )
+        # Icons and flags come from the offline pack built by setup.sh (asset_pack.py), anything
+        # missing from it is downloaded and cached resized, in memory and on disk
+        self.asset_cache = AssetCache(pack=load_pack())
+        self.weather_group = None  # WeatherGroup batching current weather across locations
+
+        # Stage latencies, cache and HTTP counters for Prometheus, and an optional per-frame span trace
+        self.metrics = _create_metrics()
+        self.metrics_file = textfile_path(self.metrics_name)
+        self.trace = SpanTrace(TRACE_PATH) if TRACE_PATH else None
+        if METRICS_PORT:
+            self.metrics.serve(METRICS_PORT)
+
+        # Every location's store refreshes on its own thread through one fetch pool, and wakes
+        # the loop through one event
+        self.fetch_stage = FetchStage()
+        self.changed = threading.Event()
+
+        self.status = StatusPublisher("display")  # Health updates for the LED controller and supervisor
+        # Fonts, glyph atlases and the other carousel pages (pre-rendered while their data is
+        # unchanged) are shared by every screen
+        self.fonts = load_fonts(self.font_path)
+        self.text_cache = TextCache()
+        self.page_cache = PageCache(self.fonts)
+        self.metrics.add_collector(self.collect_metrics)
+
+        # The clock wakes the loop on minute boundaries, a finished refresh or a page change in between;
+        # frames whose inputs did not change are neither rendered nor pushed
+        self.ticker = MinuteTicker()
+        self.add_screens()
+        self.started = True
+        if self.profile is not None:
+            self.profile.mark("setup")
+        return self
+
+    def open_displays(self):
+        if self.display is None:
+            self.display = create_display(self.backend, output=self.output, background=True)
+
+    def add_screens(self):
+        # Location resolved by IP once per network, or fixed by the location override
+        site = self.add_site(self.location_override)
+        self.add_screen("display", self.display, site, self.pages, self.page_seconds)
+
+    def add_site(self, location_override, history_path=HISTORY_PATH, snapshot_path=SNAPSHOT_PATH):
+        """Weather store, history and page data for one location"""
+        location_cache = LocationCache(self.location_ttl, override=location_override)
+        # Every observation, kept for a week in a fixed-size file written in batches
+        history = WeatherHistory(history_path)
+        weather_service = WeatherService(self.data_client, self.asset_cache, self.api_key,
+                                         location_cache=location_cache, history=history,
+                                         weather_group=self.weather_group)
+        # Last good data, restored from disk at once and refreshed in the background
+        weather_store = WeatherStore(weather_service, self.fetch_stage, path=snapshot_path, metrics=self.metrics,
+                                     trace=self.trace, changed=self.changed)
+        site = Site(weather_store, history, PageData(weather_store, self.data_client, history, self.history_hours))
+        self.sites.append(site)
+        return site
+
+    def add_screen(self, name, display, site, pages, page_seconds):
+        renderer = Renderer(display, framebuffer=FrameBuffer(display, display.width, display.height),
+                            text_cache=self.text_cache, fonts=self.fonts)
+        screen = Screen(name, renderer, site.weather_store, site.page_data, self.page_cache, pages=pages,
+                        page_seconds=page_seconds)
+        self.screens.append(screen)
+        self.page_cache.max_entries = PAGE_CACHE_ENTRIES * len(self.screens)
+        return screen
+
+    def run(self):
+        """Show the first frame, then update the screens until interrupted"""
+        if not self.started:
+            self.start()
+        logger.info("Weather Display starting...")
+        try:
+            try:
+                self.show_first_frame()
+            except Exception as e:
+                self.error_count += 1
+                logger.error(f"Error showing the first frame: {e}")
+                for screen in self.screens:
+                    screen.frame_gate.reset()
+
+            # In pipeline mode the render and push threads draw the screen; this loop only reports health
+            if self.mode == "pipeline":
+                renderer = self.screens[0].renderer
+                self.card_slide = CardSlide()
+                self.error_gate = FrameGate()
+                renderer.repaint()  # The pipeline's buffers start from the whole frame
+                self.pipeline = RenderPipeline(renderer, renderer.framebuffer, self.produce_values,
+                                               fps=self.pipeline_fps, metrics=self.metrics,
+                                               display=self.screens[0].name)
+                self.pipeline.start()
+            self.loop()
+        finally:
+            self.stop()
+
+    def show_first_frame(self, refresh=True):
+        """Draw the first frame and start refreshing.
+
+        A restart draws the snapshots on disk at once, before the first refresh
+        competes for the CPU (or without refreshing at all if refresh is False);
+        a first boot without them waits for that refresh.
+        """
+        stores = [site.weather_store for site in self.sites]
+        if all(store.has_data() for store in stores):
+            try:
+                self.update(datetime.now())
+            finally:
+                if refresh:
+                    for store in stores:
+                        store.start()
+        else:
+            for store in stores:
+                store.start()
+            # Until every store has data or an error to show
+            deadline = time.monotonic() + FIRST_FETCH_WAIT
+            while (any(not store.has_data() and not store.failures for store in stores)
+                   and time.monotonic() < deadline):
+                stores[0].wait(deadline - time.monotonic())
+            self.update(datetime.now())
+        self.report_startup()
+
+    def loop(self):
+        while True:
+            try:
+                self.update(datetime.now())
+                self.frame_count += 1
+                if self.frame_count % STATS_LOG_INTERVAL == 0:
+                    self.log_stats()
+                self.wait()
+
+            except KeyboardInterrupt:
+                logger.info("Program stopped by user")
+                break
+            except Exception as e:
+                self.error_count += 1
+                logger.error(f"Error in main loop #{self.error_count}: {e}")
+                for screen in self.screens:
+                    screen.frame_gate.reset()
+                self.publish(STATE_ERROR, message=str(e))
+
+                if self.error_count >= MAX_ERRORS:
+                    logger.critical("Too many errors, terminating program")
+                    break
+
+                time.sleep(30)  # Wait short in case of error
+
+    def update(self, now):
+        """Draw whatever changed (unless the pipeline draws) and publish the worst screen's health"""
+        frame_start = time.monotonic()
+        states = []
+        messages = []
+        for screen in self.screens:
+            try:
+                state, message = self.update_screen(screen, now)
+            except Exception as e:
+                if len(self.screens) == 1:
+                    raise
+                # One failing panel must not keep the others from updating
+                logger.error(f"Error updating {screen.name}: {e}")
+                screen.frame_gate.reset()
+                state, message = STATE_ERROR, str(e)
+            states.append(state)
+            if message:
+                messages.append(message)
+        self.error_count = 0  # Reset error counter after successful update
+
+        if self.pipeline is None:
+            frame_latency = time.monotonic() - frame_start
+        else:
+            frame_latency = self.pipeline.frame_latency()
+        if self.metrics_file:
+            self.metrics.write_textfile(self.metrics_file)
+
+        fields = {"message": messages[0]} if messages else {}
+        self.publish(max(states, key=STATE_SEVERITY.index), frame_latency_ms=frame_latency * 1000, **fields)
+
+    def update_screen(self, screen, now):
+        """Draw one screen (unless the pipeline draws); returns its state and error message"""
+        store = screen.weather_store
+        frame = store.frame()
+        if self.pipeline is None:
+            drawn = screen.update(now, frame)
+            if drawn == "main":
+                self.record_frame(screen)
+            elif drawn is not None:
+                self.metrics.inc("frames_total", display=screen.name)
+            else:
+                self.metrics.inc("frames_skipped_total", display=screen.name)
+
+        # Nothing good has ever been fetched: nothing to show but the error
+        if frame["location"] is None:
+            return STATE_ERROR, store.last_error or "TIMEOUT - CONNECTION ERROR"
+        if store.failures > 0 or frame["missing"] or (store.age() or 0) > DATA_AGE_VISIBLE:
+            return STATE_STALE, None
+        return STATE_OK, None
+
+    def publish(self, state, **fields):
+        """Send the display's health, with the data freshness of every location summed or maxed"""
+        stores = [site.weather_store for site in self.sites]
+        self.status.publish(
+            state,
+            displays=len(self.screens),
+            stale_seconds=max((store.age() or 0) for store in stores),
+            missing=sum(len(store.missing) for store in stores),
+            fetch_failures=sum(store.failures for store in stores),
+            errors=self.error_count,
+            **fields,
+        )
+
+    def wait(self):
+        """Sleep until the next minute, page change on any screen or finished refresh of any store"""
+        tick_delay = self.ticker.delay()
+        page_delays = [screen.delay() for screen in self.screens if screen.delay() is not None]
+        store = self.sites[0].weather_store  # Every store sets the same changed event
+        if page_delays and min(page_delays) < tick_delay:
+            store.wait(min(page_delays))
+        elif not store.wait(tick_delay):  # Wakes early to show a finished refresh
+            self.metrics.set("tick_lateness_seconds", self.ticker.lateness())
+
+    def report_startup(self):
+        """Close the startup profile once the first frame is on the panels"""
+        if self.profile is None:
+            return
+        self.profile.mark("first frame")
+        for screen in self.screens:
+            display = screen.renderer.display
+            if getattr(display, "init_seconds", None) is not None:  # BackgroundDisplay
+                suffix = f" ({screen.name})" if len(self.screens) > 1 else ""
+                self.profile.add(f"panel initialization{suffix}", display.init_seconds)
+                self.profile.add(f"first frame waiting for the panel{suffix}", display.wait_seconds)
+        self.profile.report()
+        self.profile.record(self.metrics)
+        self.profile = None
+
+    def stop(self):
+        if self.pipeline is not None:
+            self.pipeline.stop()
+            self.pipeline = None
+        if self.started:
+            self.page_cache.shutdown()
+            for site in self.sites:
+                site.weather_store.stop()
+                site.history.flush()
+        logger.info("Program terminated")
+
+    def produce_values(self, now):
+        """Widget values for the render pipeline's next frame (runs on its render thread)"""
+        screen = self.screens[0]
+        frame = screen.weather_store.frame()
+        if frame["location"] is None:
+            error_message = screen.weather_store.last_error or "TIMEOUT - CONNECTION ERROR"
+            if self.error_gate.changed({"error": error_message}):
+                screen.renderer.render_error(error_message)
+            return None
+        values = widget_values(frame, now, seconds=True)
+        values["forecast"] = self.card_slide.apply(values["forecast"], time.monotonic())
+        return values
+
+    def collect_metrics(self, metrics):
+        """Copy the caches' own counters into the metrics at export time"""
+        for endpoint, counters in self.data_client.stats().items():
+            for result in ("hits", "not_modified", "misses", "errors", "coalesced", "over_budget"):
+                metrics.set("http_requests_total", counters[result], endpoint=endpoint, result=result)
+        for tier, count in self.asset_cache.stats.items():
+            metrics.set("asset_cache_total", count, result=tier)
+        for host, counters in self.request_budget.stats().items():
+            for decision, count in counters.items():
+                metrics.set("budget_requests_total", count, host=host, decision=decision)
+        metrics.set("data_age_seconds", max((site.weather_store.age() or 0) for site in self.sites))
+        for screen in self.screens:
+            metrics.set("display_bytes_total", screen.renderer.framebuffer.bytes_pushed, display=screen.name)
+        for result, count in self.page_cache.stats.items():
+            metrics.set("page_cache_total", count, result=result)
+        if self.pipeline is not None:
+            metrics.set("pipeline_fps", self.pipeline.fps())
+            metrics.set("pipeline_dropped_frames_total", self.pipeline.dropped)
+
+    def record_frame(self, screen):
+        """Render and push latencies of one main page update"""
+        timings = screen.renderer.timings
+        self.metrics.observe("stage_seconds", timings["layout"] + timings["text"] + timings["icons"],
+                             stage="render")
+        self.metrics.observe("stage_seconds", timings["convert"] + timings["push"], stage="push")
+        self.metrics.inc("frames_total", display=screen.name)
+        if self.trace is not None:
+            spans = []
+            offset = 0.0
+            for stage in ("layout", "text", "icons", "convert", "push"):
+                spans.append((stage, offset, timings[stage]))
+                offset += timings[stage]
+            self.trace.record("frame", spans, frame=self.frame_count)
+
+    def log_stats(self):
+        self.data_client.log_stats()
+        self.request_budget.log_stats()
+        if self.pipeline is None:
+            for screen in self.screens:
+                logger.info(f"{screen.name}: {screen.frame_gate.drawn} frames drawn, "
+                            f"{screen.frame_gate.skipped} unchanged frames skipped")
+        else:
+            self.pipeline.log_stats()
+
+
+def _create_metrics():
+    metrics = Metrics()
+    metrics.describe("stage_seconds", "histogram", "Latency of each fetch and display stage")
+    metrics.describe("refreshes_total", "counter", "Background data refreshes by result")
+    metrics.describe("frames_total", "counter", "Screen updates by display")
+    metrics.describe("frames_skipped_total", "counter", "Wake-ups whose frame matched the one on screen, by display")
+    metrics.describe("tick_lateness_seconds", "gauge", "How late the last minute tick woke up")
+    metrics.describe("http_requests_total", "counter", "Upstream requests by endpoint and cache result")
+    metrics.describe("asset_cache_total", "counter", "Icon and flag lookups by cache tier")
+    metrics.describe("budget_requests_total", "counter", "Request budget decisions by host")
+    metrics.describe("data_age_seconds", "gauge", "Age of the oldest data on screen")
+    metrics.describe("display_bytes_total", "counter", "Bytes sent to each display")
+    metrics.describe("page_cache_total", "counter", "Page lookups by result, and pages pre-rendered")
+    metrics.describe("pipeline_fps", "gauge", "Frames per second the render pipeline achieves")
+    metrics.describe("pipeline_dropped_frames_total", "counter",
+                     "Pipeline frames missed or replaced before being pushed")
+    metrics.describe("startup_seconds", "gauge", "Time from process start to the first frame, by phase")
+    return metrics
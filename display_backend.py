@@ -0,0 +1,170 @@
+import os
+import time
+import logging
+import threading
+
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Panel geometry
+DISPLAY_WIDTH = 240
+DISPLAY_HEIGHT = 320
+
+BACKENDS = ("st7789", "memory", "file")
+
+
+class ST7789Display:
+    """The real panel on SPI. Hardware modules are imported only when this backend is chosen.
+
+    Pins are board pin names; several panels can share the SPI bus with their own chip select.
+    """
+
+    def __init__(self, width=DISPLAY_WIDTH, height=DISPLAY_HEIGHT, cs="CE0", dc="D25", rst="D24"):
+        import board
+        import digitalio
+        from adafruit_rgb_display import st7789
+
+        spi = board.SPI()
+        cs_pin = digitalio.DigitalInOut(getattr(board, cs))  # Chip Select
+        dc_pin = digitalio.DigitalInOut(getattr(board, dc))  # Data/Command
+        reset_pin = digitalio.DigitalInOut(getattr(board, rst))  # Reset
+        self.panel = st7789.ST7789(
+            spi, cs=cs_pin, dc=dc_pin, rst=reset_pin, width=width, height=height, rotation=0
+        )
+        self.width = self.panel.width
+        self.height = self.panel.height
+
+    def image(self, img, rotation=None, x=0, y=0):
+        self.panel.image(img, rotation=rotation, x=x, y=y)
+
+    def _block(self, x0, y0, x1, y1, data=None):
+        return self.panel._block(x0, y0, x1, y1, data)
+
+    def flush(self):
+        pass
+
+
+class MemoryDisplay:
+    """In-memory RGB565 panel with the same image()/_block() interface as the ST7789 driver"""
+
+    def __init__(self, width=DISPLAY_WIDTH, height=DISPLAY_HEIGHT):
+        self.width = width
+        self.height = height
+        self.pixels = np.zeros((height, width), dtype=">u2")
+        self.bytes_written = 0
+        self.writes = 0
+
+    def image(self, img, rotation=None, x=0, y=0):
+        rgb = np.asarray(img.convert("RGB")).astype(np.uint16)
+        color = ((rgb[:, :, 0] & 0xF8) << 8) | ((rgb[:, :, 1] & 0xFC) << 3) | (rgb[:, :, 2] >> 3)
+        self._block(x, y, x + img.width - 1, y + img.height - 1, color.astype(">u2").tobytes())
+
+    def _block(self, x0, y0, x1, y1, data=None):
+        if data is None:
+            return
+        window = np.frombuffer(data, dtype=">u2").reshape(y1 - y0 + 1, x1 - x0 + 1)
+        self.pixels[y0:y1 + 1, x0:x1 + 1] = window
+        self.bytes_written += len(data)
+        self.writes += 1
+
+    def flush(self):
+        pass
+
+    def snapshot(self):
+        """Return the panel contents as a PIL RGB image"""
+        color = self.pixels.astype(np.uint16)
+        rgb = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        rgb[:, :, 0] = (color >> 8) & 0xF8
+        rgb[:, :, 1] = (color >> 3) & 0xFC
+        rgb[:, :, 2] = (color << 3) & 0xF8
+        return Image.fromarray(rgb, "RGB")
+
+
+class FileDisplay(MemoryDisplay):
+    """Memory panel that writes each finished frame to a PNG, or raw RGB565 for any other extension"""
+
+    def __init__(self, path, width=DISPLAY_WIDTH, height=DISPLAY_HEIGHT):
+        super().__init__(width, height)
+        self.path = path
+
+    def flush(self):
+        tmp_path = f"{self.path}.tmp"
+        try:
+            if self.path.lower().endswith(".png"):
+                self.snapshot().save(tmp_path, format="PNG")
+            else:
+                with open(tmp_path, "wb") as f:
+                    f.write(self.pixels.tobytes())
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.error(f"Could not write frame to {self.path}: {e}")
+
+
+class BackgroundDisplay:
+    """A display initialized on its own thread, so the panel's reset delays overlap the rest of startup.
+
+    width and height are the configured geometry, known before the panel
+    answers; the first write waits for initialization to finish and raises its
+    error if it failed.
+    """
+
+    def __init__(self, factory, width=DISPLAY_WIDTH, height=DISPLAY_HEIGHT):
+        self.width = width
+        self.height = height
+        self.init_seconds = None  # Time initialization took, once it finished
+        self.wait_seconds = 0.0  # Time writes spent waiting for it
+        self._display = None
+        self._error = None
+        self._ready = threading.Event()
+        threading.Thread(target=self._init, args=(factory,), name="display-init", daemon=True).start()
+
+    def _init(self, factory):
+        start = time.monotonic()
+        try:
+            self._display = factory()
+        except Exception as e:
+            logger.error(f"Display initialization failed: {e}")
+            self._error = e
+        finally:
+            self.init_seconds = time.monotonic() - start
+            self._ready.set()
+
+    def wait(self):
+        """The initialized display"""
+        if not self._ready.is_set():
+            start = time.monotonic()
+            self._ready.wait()
+            self.wait_seconds += time.monotonic() - start
+        if self._error is not None:
+            raise self._error
+        return self._display
+
+    def image(self, img, rotation=None, x=0, y=0):
+        self.wait().image(img, rotation=rotation, x=x, y=y)
+
+    def _block(self, x0, y0, x1, y1, data=None):
+        return self.wait()._block(x0, y0, x1, y1, data)
+
+    def flush(self):
+        self.wait().flush()
+
+    def __getattr__(self, name):
+        return getattr(self.wait(), name)  # e.g. MemoryDisplay.snapshot()
+
+
+def create_display(backend="st7789", output=None, background=False, **pins):
+    """Create a display backend by name: st7789 (optionally with cs/dc/rst pin names), memory or file.
+
+    With background=True the display is returned at once and initialized on its own thread.
+    """
+    if background and backend in BACKENDS:
+        return BackgroundDisplay(lambda: create_display(backend, output, **pins))
+    if backend == "st7789":
+        return ST7789Display(**pins)
+    if backend == "memory":
+        return MemoryDisplay()
+    if backend == "file":
+        return FileDisplay(output or "frame.png")
+    raise ValueError(f"Unknown display backend '{backend}', expected one of {', '.join(BACKENDS)}")
@@ -0,0 +1,129 @@
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+logger = logging.getLogger(__name__)
+
+# Fetch stage settings
+FETCH_WORKERS = 6
+ITEM_DEADLINES = {  # Seconds each item may take before the frame renders without it
+    "location": 10,
+    "weather": 5,
+    "forecast": 5,
+    "hourly": 5,
+    "flag": 4,
+    "icon": 4,
+}
+
+
+class FetchStage:
+    """Resolve the location, then fetch weather, forecast, flag and icons concurrently.
+
+    Every item has its own deadline; whatever has not arrived in time is left out
+    of the result so the frame can render placeholders. Late requests keep running
+    in the pool and land in the data/asset caches for the next frame.
+    """
+
+    def __init__(self, max_workers=FETCH_WORKERS, deadlines=None):
+        self.deadlines = dict(ITEM_DEADLINES)
+        if deadlines:
+            self.deadlines.update(deadlines)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fetch")
+
+    def run(self, fetch_location, fetch_weather, fetch_forecast, fetch_flag, fetch_icon,
+            weather_icons, forecast_icons, fetch_hourly=None, hourly_icons=None):
+        """Return a dict with location, weather, forecast, hourly, flag, icons and the names of missing items.
+
+        fetch_weather/fetch_forecast/fetch_hourly/fetch_flag take the location;
+        fetch_icon takes (code, size). weather_icons/forecast_icons/hourly_icons
+        map a result to the (code, size) pairs it needs. spans lists (kind, start, duration) in
+        seconds from the start of the run for every item that finished in time.
+        """
+        frame = {"location": None, "weather": None, "forecast": None, "hourly": None, "flag": None,
+                 "icons": {}, "missing": [], "spans": []}
+        run_start = time.monotonic()
+        spans = []
+
+        def timed(kind, fn, *args):
+            start = time.monotonic()
+            try:
+                return fn(*args)
+            finally:
+                spans.append((kind, start - run_start, time.monotonic() - start))
+
+        location_future = self.executor.submit(timed, "location", fetch_location)
+        done, _ = wait([location_future], timeout=self.deadlines["location"])
+        if not done:
+            logger.warning("Location did not arrive before its deadline")
+            frame["missing"].append("location")
+            return frame
+        frame["location"] = self._value("location", location_future)
+        if frame["location"] is None:
+            frame["missing"].append("location")
+            frame["spans"] = list(spans)
+            return frame
+
+        pending = {}
+        requested_icons = set()
+
+        def submit(name, kind, fn, *args):
+            future = self.executor.submit(timed, kind, fn, *args)
+            pending[future] = (name, time.monotonic() + self.deadlines[kind])
+
+        def submit_icons(pairs):
+            for code, size in pairs:
+                key = (code, tuple(size))
+                if code and key not in requested_icons:
+                    requested_icons.add(key)
+                    submit(key, "icon", fetch_icon, code, size)
+
+        location = frame["location"]
+        submit("weather", "weather", fetch_weather, location)
+        submit("forecast", "forecast", fetch_forecast, location)
+        submit("flag", "flag", fetch_flag, location)
+        if fetch_hourly is not None:
+            submit("hourly", "hourly", fetch_hourly, location)
+
+        while pending:
+            now = time.monotonic()
+            for future, (name, deadline) in list(pending.items()):
+                if deadline <= now:
+                    logger.warning(f"{name} did not arrive before its deadline")
+                    frame["missing"].append(name)
+                    del pending[future]
+            if not pending:
+                break
+
+            timeout = min(deadline for _, deadline in pending.values()) - now
+            done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                name, _ = pending.pop(future)
+                value = self._value(name, future)
+                if isinstance(name, tuple):
+                    if value is None:
+                        frame["missing"].append(name)
+                    else:
+                        frame["icons"][name] = value
+                    continue
+                frame[name] = value
+                if value is None:
+                    frame["missing"].append(name)
+                elif name == "weather":
+                    submit_icons(weather_icons(value))
+                elif name == "forecast":
+                    submit_icons(forecast_icons(value))
+                elif name == "hourly":
+                    submit_icons(hourly_icons(value))
+
+        frame["spans"] = list(spans)  # Late items keep appending to spans, not to the frame
+        return frame
+
+    def _value(self, name, future):
+        try:
+            return future.result()
+        except Exception as e:
+            logger.error(f"Error fetching {name}: {e}")
+            return None
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,94 @@
+import logging
+import threading
+from collections import namedtuple
+from datetime import datetime, timezone
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Aggregation settings
+SECONDS_PER_DAY = 86400
+# OpenWeatherMap icon groups, most severe first, so a tie picks the worse weather
+ICON_SEVERITY = ("11", "13", "09", "10", "50", "04", "03", "02", "01")
+
+# One local calendar day of the 3-hourly forecast
+Day = namedtuple("Day", "date name low high icon pop rain")
+
+
+def daily_summary(forecast_data):
+    """Bucket a /forecast response by local calendar day.
+
+    Days follow the location's UTC offset from the response, not the device's
+    clock. Per day: lowest and highest temperature, the most frequent icon
+    (shown in its day variant), the highest chance of precipitation and the
+    total rain and snow in mm. Entries are parsed once into arrays and every
+    day is reduced in the same vectorized pass.
+    """
+    entries = []
+    for entry in forecast_data.get("list", []):
+        try:
+            main = entry["main"]
+            entries.append((
+                entry["dt"],
+                main.get("temp_min", main["temp"]),
+                main.get("temp_max", main["temp"]),
+                entry["weather"][0]["icon"][:2],
+                entry.get("pop", 0.0),
+                entry.get("rain", {}).get("3h", 0.0) + entry.get("snow", {}).get("3h", 0.0),
+            ))
+        except (KeyError, IndexError, TypeError) as e:
+            logger.warning(f"Skipping forecast entry: {e}")
+    if not entries:
+        return []
+    entries.sort(key=lambda entry: entry[0])
+
+    times, lows, highs, icons, pops, rain = zip(*entries)
+    offset = forecast_data.get("city", {}).get("timezone", 0)
+    days = (np.array(times, dtype=np.int64) + offset) // SECONDS_PER_DAY
+    # Entries are in time order, so each day is one contiguous run starting at these indices
+    starts = np.flatnonzero(np.diff(days, prepend=days[0] - 1))
+    day_index = np.cumsum(np.diff(days, prepend=days[0]) != 0)
+
+    icon_index = np.array([ICON_SEVERITY.index(icon) if icon in ICON_SEVERITY else len(ICON_SEVERITY) - 1
+                           for icon in icons])
+    counts = np.zeros((len(starts), len(ICON_SEVERITY)), dtype=np.int64)
+    np.add.at(counts, (day_index, icon_index), 1)
+    dominant = counts.argmax(axis=1)  # First (most severe) icon among equally frequent ones
+
+    low = np.minimum.reduceat(np.array(lows, dtype=float), starts)
+    high = np.maximum.reduceat(np.array(highs, dtype=float), starts)
+    pop = np.maximum.reduceat(np.array(pops, dtype=float), starts)
+    total_rain = np.add.reduceat(np.array(rain, dtype=float), starts)
+
+    summary = []
+    for i, day in enumerate(days[starts].tolist()):
+        date = datetime.fromtimestamp(day * SECONDS_PER_DAY, timezone.utc).date()
+        summary.append(Day(date, date.strftime("%a"), float(low[i]), float(high[i]),
+                           f"{ICON_SEVERITY[dominant[i]]}d", float(pop[i]), float(total_rain[i])))
+    return summary
+
+
+class DailyForecast:
+    """daily_summary() memoized on the payload object.
+
+    The data client hands back the same decoded object for as long as it is
+    cached or revalidated (304), so the days are only recomputed when a new
+    forecast arrives.
+    """
+
+    def __init__(self):
+        self.computed = 0
+        self._payload = None
+        self._days = []
+        self._lock = threading.Lock()
+
+    def days(self, forecast_data):
+        with self._lock:
+            if forecast_data is self._payload:
+                return self._days
+        days = daily_summary(forecast_data)
+        with self._lock:
+            self._payload, self._days = forecast_data, days  # Holding the payload keeps its id unique
+            self.computed += 1
+        return days
@@ -0,0 +1,101 @@
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def rgb565(image):
+    """A whole PIL RGB image as a new big-endian RGB565 array.
+
+    Allocates its own temporaries, so unlike FrameBuffer.convert() it is safe
+    to call from any thread.
+    """
+    rgb = np.asarray(image).astype(np.uint16)
+    packed = ((rgb[:, :, 0] << 8) & 0xF800) | ((rgb[:, :, 1] << 3) & 0x07E0) | (rgb[:, :, 2] >> 3)
+    return packed.astype(">u2")
+
+
+class FrameBuffer:
+    """RGB565 framebuffer that sends only changed row spans to an ST7789.
+
+    Frames are converted with NumPy into a preallocated big-endian uint16
+    buffer. push() compares it with what the panel already shows and writes
+    each run of changed rows as one window through the driver's _block().
+    """
+
+    def __init__(self, display, width, height):
+        self.display = display
+        self.width = width
+        self.height = height
+        self.pending = np.zeros((height, width), dtype=">u2")  # Next frame, panel byte order
+        self.shown = np.zeros((height, width), dtype=">u2")  # What the panel currently shows
+        self.bytes_pushed = 0
+        self.frames_pushed = 0
+        self.valid = False  # Panel contents unknown until the first full push
+        # Scratch channels reused by every conversion
+        self._red = np.empty((height, width), dtype=np.uint16)
+        self._green = np.empty((height, width), dtype=np.uint16)
+        self._blue = np.empty((height, width), dtype=np.uint16)
+
+    def new_buffer(self):
+        """A spare frame-sized buffer for convert(out=...) and push(source=...)"""
+        return np.zeros_like(self.pending)
+
+    def convert(self, image, rect=None, out=None):
+        """Convert rect (x0, y0, x1, y1) of a PIL RGB image into the pending buffer (or out)"""
+        x0, y0, x1, y1 = rect or (0, 0, self.width, self.height)
+        rgb = np.asarray(image.crop((x0, y0, x1, y1)) if rect else image)
+        red = self._red[: y1 - y0, : x1 - x0]
+        green = self._green[: y1 - y0, : x1 - x0]
+        blue = self._blue[: y1 - y0, : x1 - x0]
+        out = (self.pending if out is None else out)[y0:y1, x0:x1]
+
+        np.copyto(red, rgb[:, :, 0])
+        np.left_shift(red, 8, out=red)
+        np.bitwise_and(red, 0xF800, out=red)
+        np.copyto(green, rgb[:, :, 1])
+        np.left_shift(green, 3, out=green)
+        np.bitwise_and(green, 0x07E0, out=green)
+        np.copyto(blue, rgb[:, :, 2])
+        np.right_shift(blue, 3, out=blue)
+        np.bitwise_or(red, green, out=red)
+        np.bitwise_or(red, blue, out=out)
+
+    def changed_spans(self, source=None):
+        """Return (x0, y0, x1, y1) windows, exclusive ends, covering every changed pixel"""
+        if not self.valid:
+            return [(0, 0, self.width, self.height)]
+        changed = (self.pending if source is None else source) != self.shown
+        rows = np.flatnonzero(changed.any(axis=1))
+        if rows.size == 0:
+            return []
+
+        # Split changed rows into runs of consecutive rows
+        breaks = np.flatnonzero(np.diff(rows) > 1)
+        starts = np.concatenate(([rows[0]], rows[breaks + 1]))
+        ends = np.concatenate((rows[breaks], [rows[-1]])) + 1
+
+        spans = []
+        for y0, y1 in zip(starts, ends):
+            columns = np.flatnonzero(changed[y0:y1].any(axis=0))
+            spans.append((int(columns[0]), int(y0), int(columns[-1]) + 1, int(y1)))
+        return spans
+
+    def push(self, source=None):
+        """Send the changed spans of the pending buffer (or source) and return the bytes written"""
+        source = self.pending if source is None else source
+        sent = 0
+        for x0, y0, x1, y1 in self.changed_spans(source):
+            window = source[y0:y1, x0:x1]
+            self.display._block(x0, y0, x1 - 1, y1 - 1, window.tobytes())
+            self.shown[y0:y1, x0:x1] = window
+            sent += window.nbytes
+        self.valid = True
+        self.bytes_pushed += sent
+        self.frames_pushed += 1
+        return sent
+
+    def invalidate(self):
+        """Force the next push to resend the whole frame"""
+        self.valid = False
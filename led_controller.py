@@ -1,8 +1,17 @@
-import RPi.GPIO as GPIO
+import os
 import time
 import logging
 import signal
 import sys
+import threading
+import led_patterns
+from status_bus import StatusSubscriber, STATE_OK, STATE_STALE, STATE_ERROR, STATE_DOWN
+
+# Set SKYFORGE_FAKE_GPIO=1 to run without a Raspberry Pi (writes are recorded in memory)
+if os.environ.get("SKYFORGE_FAKE_GPIO"):
+    GPIO = led_patterns.FakeGPIO()
+else:
+    import RPi.GPIO as GPIO
 
 # Logging setup
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -16,6 +25,32 @@ LED2_PIN = 27  # Second LED (Red) on GPIO 27 (Pin 13)
 GPIO.setwarnings(False)  # Warnings are disabled to avoid "channel already in use" messages
 GPIO.setmode(GPIO.BCM)   # Use BCM pin numbering
 
+# Available patterns, selectable with LED_PATTERN
+PATTERNS = {
+    "double-blink": led_patterns.double_blink(LED1_PIN, LED2_PIN),
+    "heartbeat": led_patterns.heartbeat(LED1_PIN),
+    "blink-red": led_patterns.blink(LED2_PIN),
+    "solid-green": led_patterns.solid(LED1_PIN),
+    "solid-red": led_patterns.solid(LED2_PIN),
+    "dim-green": led_patterns.dim(LED1_PIN, 20),
+    "off": led_patterns.off(LED1_PIN, LED2_PIN),
+}
+DEFAULT_PATTERN = os.environ.get("LED_PATTERN", "double-blink")
+
+# Display health shown on the LEDs; a fixed LED_PATTERN disables this
+FOLLOW_STATUS = "LED_PATTERN" not in os.environ
+STATUS_PATTERNS = {
+    STATE_OK: "double-blink",
+    STATE_STALE: "heartbeat",
+    STATE_ERROR: "blink-red",
+    STATE_DOWN: "solid-red",
+}
+STATUS_TIMEOUT = 180  # The display reports every frame; silence this long means its state is unknown
+SILENT_PATTERN = "heartbeat"  # Shown while no reports arrive; the supervisor reports "down" when the process exits
+STATS_INTERVAL = 600  # Seconds between engine statistics reports
+
+engine = led_patterns.LedEngine(GPIO)
+
 def setup_gpio():
     """Initialize GPIO pins"""
     try:
@@ -32,6 +67,7 @@ def setup_gpio():
 def cleanup_gpio():
     """Clean up GPIO resources"""
     try:
+        engine.stop()
         GPIO.output(LED1_PIN, GPIO.LOW)  # Turn off LED1
         GPIO.output(LED2_PIN, GPIO.LOW)  # Turn off LED2
         GPIO.cleanup()  # Reset all GPIO pins to a safe state
@@ -45,16 +81,34 @@ def signal_handler(signum, frame):
     cleanup_gpio()
     sys.exit(0)
 
-def blink_twice(pin, led_name="LED"):
-    """Blink a specific LED twice quickly with error handling"""
+def set_pattern(name):
+    """Switch the running pattern by name"""
+    pattern = PATTERNS.get(name)
+    if pattern is None:
+        logger.error(f"Unknown LED pattern '{name}', available: {', '.join(PATTERNS)}")
+        return
+    engine.set_pattern(pattern)
+
+def watch_status():
+    """Switch patterns as soon as the weather display reports a new state"""
     try:
-        for i in range(2):
-            GPIO.output(pin, GPIO.HIGH)  # Turn on the LED
-            time.sleep(0.05)            # Wait for 50ms
-            GPIO.output(pin, GPIO.LOW)  # Turn off the LED
-            time.sleep(0.05)            # Wait for 50ms
-    except Exception as e:
-        logger.error(f"Error blinking {led_name}: {e}")
+        subscriber = StatusSubscriber("led")
+    except OSError as e:
+        logger.error(f"Status bus unavailable, keeping fixed pattern: {e}")
+        return
+
+    current_state = None
+    while True:
+        message = subscriber.receive(timeout=STATUS_TIMEOUT)
+        if message is None:
+            state, pattern = "silent", SILENT_PATTERN
+        else:
+            state = message.get("state", STATE_DOWN)
+            pattern = STATUS_PATTERNS.get(state, "double-blink")
+        if state != current_state:
+            logger.info(f"Display state: {state}")
+            set_pattern(pattern)
+            current_state = state
 
 def main():
     """Main function with proper error handling"""
@@ -66,26 +120,14 @@ def main():
     
     try:
         setup_gpio()
-        
-        cycle_count = 0
+        engine.start(PATTERNS.get(DEFAULT_PATTERN, PATTERNS["double-blink"]))
+        if FOLLOW_STATUS:
+            threading.Thread(target=watch_status, name="status", daemon=True).start()
+
+        # The engine thread sleeps until each LED edge; this thread only reports
         while True:
-            cycle_count += 1
-            
-            # First LED (Green) blinks twice quickly
-            blink_twice(LED1_PIN, "Green LED")
-            
-            # Wait 0.7 seconds
-            time.sleep(0.7)
-            
-            # Second LED (Red) blinks twice quickly
-            blink_twice(LED2_PIN, "Red LED")
-            
-            # Wait 1.2 seconds before the next cycle
-            time.sleep(1.2)
-            
-            # Log every 50 cycles to avoid spam
-            if cycle_count % 50 == 0:
-                logger.info(f"LED cycle #{cycle_count} completed")
+            time.sleep(STATS_INTERVAL)
+            logger.info(f"LED engine: {engine.wakeups} wakeups, {engine.edges_applied} edges")
                 
     except KeyboardInterrupt:
         logger.info("Program interrupted by user")
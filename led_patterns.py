@@ -0,0 +1,258 @@
+import time
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+PWM_FREQUENCY = 200  # Hz, high enough that dimmed LEDs do not visibly flicker
+
+
+class Pattern:
+    """A named LED timeline.
+
+    steps is a list of (duration, {pin: state}) where state is True (on), False
+    (off) or a float duty cycle 0-100 for PWM dimming. Pins not mentioned in a
+    step keep their previous state. Looping patterns repeat forever; static ones
+    hold the last state and need no timer at all.
+    """
+
+    def __init__(self, name, steps, loop=True):
+        self.name = name
+        self.steps = steps
+        self.loop = loop
+
+    def compile(self):
+        """Reduce the timeline to the minimal set of edge events.
+
+        Returns (start_state, edges, period): the state to apply when the pattern
+        starts, the sorted (offset, ((pin, state), ...)) changes within one cycle,
+        and the cycle length (None for static patterns).
+        """
+        pins = []
+        for _, states in self.steps:
+            for pin in states:
+                if pin not in pins:
+                    pins.append(pin)
+
+        state = {pin: False for pin in pins}
+        offset = 0.0
+        timeline = []
+        for duration, states in self.steps:
+            state = {**state, **states}
+            timeline.append((offset, state))
+            offset += duration
+        period = offset
+
+        start_state = timeline[0][1] if timeline else {}
+        edges = []
+        previous = start_state
+        for step_offset, step_state in timeline[1:]:
+            changes = tuple((pin, value) for pin, value in step_state.items() if previous.get(pin) != value)
+            if changes:
+                edges.append((step_offset, changes))
+            previous = step_state
+
+        if not self.loop or period <= 0:
+            return start_state, edges, None
+
+        # Wrapping from the last step back to the first is an edge at the end of the cycle
+        wrap = tuple((pin, value) for pin, value in start_state.items() if previous.get(pin) != value)
+        if wrap:
+            edges.append((period, wrap))
+        if not edges:
+            return start_state, [], None  # Every step is identical: nothing to schedule
+        return start_state, edges, period
+
+
+def solid(pin):
+    return Pattern(f"solid-{pin}", [(1.0, {pin: True})], loop=False)
+
+
+def off(*pins):
+    return Pattern("off", [(1.0, {pin: False for pin in pins})], loop=False)
+
+
+def blink(pin, on_time=0.5, off_time=0.5):
+    return Pattern(f"blink-{pin}", [(on_time, {pin: True}), (off_time, {pin: False})])
+
+
+def heartbeat(pin, period=1.2):
+    """Two short pulses, then rest"""
+    return Pattern(f"heartbeat-{pin}", [
+        (0.08, {pin: True}), (0.12, {pin: False}),
+        (0.08, {pin: True}), (period - 0.28, {pin: False}),
+    ])
+
+
+def dim(pin, duty):
+    return Pattern(f"dim-{pin}", [(1.0, {pin: float(duty)})], loop=False)
+
+
+def double_blink(first_pin, second_pin, first_pause=0.7, second_pause=1.2, flash=0.05):
+    """Each LED blinks twice quickly in turn (the original LED controller loop)"""
+    def twice(pin):
+        return [(flash, {pin: True}), (flash, {pin: False}), (flash, {pin: True}), (flash, {pin: False})]
+    return Pattern("double-blink",
+                   twice(first_pin) + [(first_pause, {})] + twice(second_pin) + [(second_pause, {})])
+
+
+class LedEngine:
+    """Plays compiled patterns on GPIO pins from a single timer thread.
+
+    The thread sleeps until the next edge (or forever for static patterns) and
+    is woken early only when the pattern is switched. A switch first turns off
+    every pin the previous pattern drove, PWM included, so no LED is left lit
+    by a pattern that no longer runs.
+    """
+
+    def __init__(self, gpio):
+        self.gpio = gpio
+        self.wakeups = 0
+        self.edges_applied = 0
+        self.lateness = deque(maxlen=1000)  # Seconds each edge fired after its scheduled time
+        self.pattern = None
+        self._pwm = {}
+        self._pins = set()  # Pins driven since the last switch
+        self._pending = None
+        self._changed = threading.Event()
+        self._running = False
+        self._thread = None
+
+    def start(self, pattern):
+        self._pending = pattern
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="led-engine", daemon=True)
+        self._thread.start()
+
+    def set_pattern(self, pattern):
+        """Switch patterns at runtime; takes effect immediately"""
+        self._pending = pattern
+        self._changed.set()
+
+    def stop(self):
+        self._running = False
+        self._changed.set()
+        if self._thread:
+            self._thread.join(timeout=2)
+        for pwm in self._pwm.values():
+            pwm.stop()
+        self._pwm.clear()
+
+    def _run(self):
+        edges, period, index, cycle_start = [], None, 0, 0.0
+        while self._running:
+            if self._pending is not None:
+                # Clear before taking the pattern: a switch that lands after the clear sets the event
+                # again, so it is picked up on the next pass instead of being lost
+                self._changed.clear()
+                self.pattern, self._pending = self._pending, None
+                start_state, edges, period = self.pattern.compile()
+                cycle_start = time.monotonic()
+                index = 0
+                self._reset()
+                self._apply(start_state.items())
+                logger.info(f"LED pattern: {self.pattern.name}")
+
+            if period is None and index >= len(edges):
+                timeout = None  # Static pattern: sleep until switched
+            else:
+                due = cycle_start + edges[index][0]
+                timeout = max(0.0, due - time.monotonic())
+
+            if self._changed.wait(timeout):
+                continue
+            self.wakeups += 1
+            if not self._running:
+                break
+
+            self.lateness.append(time.monotonic() - due)
+            self._apply(edges[index][1])
+            index += 1
+            if index >= len(edges) and period is not None:
+                index = 0
+                cycle_start += period
+
+    def _reset(self):
+        """Stop every PWM and drive LOW every pin the previous pattern touched"""
+        for pin in self._pins:
+            try:
+                pwm = self._pwm.pop(pin, None)
+                if pwm is not None:
+                    pwm.stop()
+                self.gpio.output(pin, self.gpio.LOW)
+            except Exception as e:
+                logger.error(f"Error turning off LED on GPIO {pin}: {e}")
+        self._pins.clear()
+
+    def _apply(self, changes):
+        for pin, value in changes:
+            self._pins.add(pin)
+            try:
+                if isinstance(value, float):
+                    pwm = self._pwm.get(pin)
+                    if pwm is None:
+                        pwm = self._pwm[pin] = self.gpio.PWM(pin, PWM_FREQUENCY)
+                        pwm.start(value)
+                    else:
+                        pwm.ChangeDutyCycle(value)
+                else:
+                    pwm = self._pwm.pop(pin, None)
+                    if pwm is not None:
+                        pwm.stop()
+                    self.gpio.output(pin, self.gpio.HIGH if value else self.gpio.LOW)
+                self.edges_applied += 1
+            except Exception as e:
+                logger.error(f"Error driving LED on GPIO {pin}: {e}")
+
+
+class FakeGPIO:
+    """Drop-in for the RPi.GPIO calls the LED controller uses, recording every write"""
+
+    BCM = "BCM"
+    OUT = "OUT"
+    HIGH = 1
+    LOW = 0
+
+    def __init__(self):
+        self.levels = {}
+        self.writes = []  # (monotonic time, pin, value)
+        self.pwms = []  # Every PWM channel created
+
+    def setwarnings(self, flag):
+        pass
+
+    def setmode(self, mode):
+        pass
+
+    def setup(self, pin, direction):
+        self.levels[pin] = self.LOW
+
+    def output(self, pin, value):
+        self.levels[pin] = value
+        self.writes.append((time.monotonic(), pin, value))
+
+    def cleanup(self):
+        self.levels.clear()
+
+    def PWM(self, pin, frequency):
+        return _FakePWM(self, pin)
+
+
+class _FakePWM:
+    def __init__(self, gpio, pin):
+        self.gpio = gpio
+        self.pin = pin
+        self.running = False
+        gpio.pwms.append(self)
+
+    def start(self, duty):
+        self.running = True
+        self.ChangeDutyCycle(duty)
+
+    def ChangeDutyCycle(self, duty):
+        self.gpio.levels[self.pin] = duty
+        self.gpio.writes.append((time.monotonic(), self.pin, duty))
+
+    def stop(self):
+        self.running = False
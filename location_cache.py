@@ -0,0 +1,97 @@
+import os
+import json
+import time
+import socket
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Location cache settings
+LOCATION_CACHE_PATH = os.path.expanduser("~/.cache/skyforge/locations.json")
+MAX_NETWORKS = 16  # Networks remembered, least recently resolved dropped first
+PROBE_ADDRESS = ("192.0.2.1", 80)  # Only used to pick the outbound interface, nothing is sent
+
+
+def network_fingerprint():
+    """Interface, default gateway and local address of the outbound route.
+
+    Changes when the device moves to another network, which is when the public
+    IP (and so the resolved location) may change. Costs no network traffic.
+    """
+    interface = gateway = local_address = None
+    try:
+        with open("/proc/net/route") as f:
+            for line in f.readlines()[1:]:
+                fields = line.split()
+                if len(fields) > 2 and fields[1] == "00000000":  # Default route
+                    interface, gateway = fields[0], fields[2]
+                    break
+    except OSError:
+        pass
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as probe:
+            probe.connect(PROBE_ADDRESS)
+            local_address = probe.getsockname()[0]
+    except OSError:
+        pass
+    return f"{interface}/{gateway}/{local_address}"
+
+
+class LocationCache:
+    """Resolved locations per network, kept on disk so the IP geolocation lookup
+    runs once per network and TTL instead of on every refresh.
+
+    An override location (fixed coordinates from the config) is always returned
+    and nothing is looked up at all.
+    """
+
+    def __init__(self, ttl, path=LOCATION_CACHE_PATH, override=None):
+        self.path = path
+        self.ttl = ttl  # Seconds before a resolved location is looked up again on the same network
+        self.override = override
+        self.entries = {}
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                self.entries = json.load(f)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable location cache {self.path}: {e}")
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(tmp_path, "w") as f:
+                json.dump(self.entries, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Could not write location cache {self.path}: {e}")
+
+    def lookup(self):
+        """Return the location fields for the current network, or None if they must be resolved"""
+        if self.override:
+            return dict(self.override)
+        with self._lock:
+            entry = self.entries.get(network_fingerprint())
+        if entry is None or time.time() - entry["resolved_at"] > self.ttl:
+            return None
+        return entry["location"]
+
+    def store(self, location, public_ip=None):
+        """Remember location fields resolved on the current network"""
+        with self._lock:
+            fingerprint = network_fingerprint()
+            previous = self.entries.get(fingerprint)
+            if previous and previous.get("public_ip") != public_ip:
+                logger.info(f"Public IP changed from {previous.get('public_ip')} to {public_ip}")
+            self.entries[fingerprint] = {"location": location, "public_ip": public_ip, "resolved_at": time.time()}
+            while len(self.entries) > MAX_NETWORKS:
+                oldest = min(self.entries, key=lambda key: self.entries[key]["resolved_at"])
+                del self.entries[oldest]
+            self.save()
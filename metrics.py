@@ -0,0 +1,256 @@
+import os
+import json
+import mmap
+import time
+import struct
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# Metrics settings
+METRICS_PREFIX = "skyforge"
+# node-exporter textfile collector directory; metrics files are only written if it exists
+METRICS_DIR = os.environ.get("SKYFORGE_METRICS_DIR", "/var/lib/node_exporter/textfile_collector")
+METRICS_PORT = int(os.environ.get("SKYFORGE_METRICS_PORT", "0"))  # Display /metrics port, supervisor uses +1; 0 is off
+TRACE_PATH = os.environ.get("SKYFORGE_TRACE")  # Span ring buffer file, off when unset
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)  # Seconds
+TRACE_SLOTS = 512  # Frames and refreshes kept in the span ring buffer
+TRACE_SLOT_BYTES = 512
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+
+def read_proc_usage(pid):
+    """Return (RSS bytes, user+system CPU seconds) from /proc, or zeros if unavailable"""
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            rss_pages = int(f.read().split()[1])
+        with open(f"/proc/{pid}/stat") as f:
+            # The command name may contain spaces, so split after its closing parenthesis
+            fields = f.read().rsplit(")", 1)[1].split()
+        utime, stime = int(fields[11]), int(fields[12])
+        return rss_pages * PAGE_SIZE, (utime + stime) / CLOCK_TICKS
+    except (OSError, IndexError, ValueError):
+        return 0, 0.0
+
+
+def textfile_path(name):
+    """Path of this process's .prom file, or None when there is no textfile collector"""
+    if not os.path.isdir(METRICS_DIR):
+        return None
+    return os.path.join(METRICS_DIR, f"{METRICS_PREFIX}_{name}.prom")
+
+
+class Metrics:
+    """Counters, gauges and latency histograms in the Prometheus text format.
+
+    Recording is a dict update under a lock. Collectors registered with
+    add_collector() run only at export time, to copy counters kept elsewhere
+    (cache stats, process usage) into gauges.
+    """
+
+    def __init__(self, prefix=METRICS_PREFIX):
+        self.prefix = prefix
+        self.types = {}
+        self.help = {}
+        self.values = {}  # (name, labels) -> value for counters and gauges
+        self.histograms = {}  # (name, labels) -> [bucket counts..., sum, count]
+        self.collectors = []
+        self._lock = threading.Lock()
+        self.describe("process_resident_memory_bytes", "gauge", "Resident set size")
+        self.describe("process_cpu_seconds_total", "counter", "User and system CPU time")
+        self.add_collector(self._collect_process)
+
+    def describe(self, name, kind, text):
+        self.types[name] = kind
+        self.help[name] = text
+
+    def add_collector(self, collector):
+        """collector(metrics) is called before every export"""
+        self.collectors.append(collector)
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def set(self, name, value, **labels):
+        with self._lock:
+            self.values[(name, tuple(sorted(labels.items())))] = value
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [0] * (len(LATENCY_BUCKETS) + 2)
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    histogram[i] += 1
+                    break
+            histogram[-2] += seconds
+            histogram[-1] += 1
+
+    def render(self):
+        """The metrics in the Prometheus text exposition format"""
+        for collector in self.collectors:
+            try:
+                collector(self)
+            except Exception as e:
+                logger.warning(f"Metrics collector failed: {e}")
+
+        with self._lock:
+            values = sorted(self.values.items())
+            histograms = sorted((key, list(counts)) for key, counts in self.histograms.items())
+
+        lines = []
+        described = set()
+
+        def header(name, default_kind):
+            if name not in described:
+                described.add(name)
+                if name in self.help:
+                    lines.append(f"# HELP {self.prefix}_{name} {self.help[name]}")
+                lines.append(f"# TYPE {self.prefix}_{name} {self.types.get(name, default_kind)}")
+
+        for (name, labels), value in values:
+            header(name, "gauge")
+            lines.append(f"{self.prefix}_{name}{_labels(labels)} {_number(value)}")
+        for (name, labels), counts in histograms:
+            header(name, "histogram")
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, counts):
+                cumulative += count
+                lines.append(f"{self.prefix}_{name}_bucket{_labels(labels + (('le', f'{bound:g}'),))} {cumulative}")
+            lines.append(f"{self.prefix}_{name}_bucket{_labels(labels + (('le', '+Inf'),))} {counts[-1]}")
+            lines.append(f"{self.prefix}_{name}_sum{_labels(labels)} {_number(counts[-2])}")
+            lines.append(f"{self.prefix}_{name}_count{_labels(labels)} {counts[-1]}")
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path):
+        """Write the metrics for node-exporter's textfile collector (atomically, as it requires)"""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, "w") as f:
+                f.write(self.render())
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not write metrics file {path}: {e}")
+
+    def serve(self, port, host="127.0.0.1"):
+        """Serve /metrics over HTTP from a daemon thread"""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+        logger.info(f"Serving metrics on http://{host}:{port}/metrics")
+        return server
+
+    def _collect_process(self, metrics):
+        rss_bytes, cpu_seconds = read_proc_usage(os.getpid())
+        metrics.set("process_resident_memory_bytes", rss_bytes)
+        metrics.set("process_cpu_seconds_total", cpu_seconds)
+
+
+class SpanTrace:
+    """Fixed-size ring buffer file of span records, one slot per frame or refresh.
+
+    The file is memory-mapped, so recording a trace is a copy into the page
+    cache: no allocation beyond the JSON line and no fsync. read() returns the
+    records oldest first.
+    """
+
+    HEADER = struct.Struct("<QII")  # Next sequence number, slot count, slot size
+
+    def __init__(self, path, slots=TRACE_SLOTS, slot_bytes=TRACE_SLOT_BYTES):
+        self.path = path
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        size = self.HEADER.size + slots * slot_bytes
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size != size:
+                os.ftruncate(fd, 0)  # Layout changed: start over
+                os.ftruncate(fd, size)
+            self.map = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        sequence, slots_in_file, slot_size = self.HEADER.unpack_from(self.map, 0)
+        if (slots_in_file, slot_size) != (slots, slot_bytes):
+            self.HEADER.pack_into(self.map, 0, 0, slots, slot_bytes)
+            sequence = 0
+        self.sequence = sequence
+        self._lock = threading.Lock()
+
+    def record(self, kind, spans, **fields):
+        """Store one record; spans is a list of (name, start offset, duration) in seconds"""
+        record = dict(fields, kind=kind, time=round(time.time(), 3),
+                      spans=[[name, round(start * 1000, 2), round(duration * 1000, 2)] for name, start, duration in spans])
+        data = json.dumps(record, separators=(",", ":")).encode()
+        if len(data) >= self.slot_bytes:
+            while record["spans"] and len(data) >= self.slot_bytes:
+                record["spans"].pop()
+                record["truncated"] = True
+                data = json.dumps(record, separators=(",", ":")).encode()
+        with self._lock:
+            offset = self.HEADER.size + (self.sequence % self.slots) * self.slot_bytes
+            self.map[offset:offset + self.slot_bytes] = data.ljust(self.slot_bytes, b"\0")
+            self.sequence += 1
+            self.HEADER.pack_into(self.map, 0, self.sequence, self.slots, self.slot_bytes)
+
+    def read(self):
+        with self._lock:
+            first = max(0, self.sequence - self.slots)
+            records = []
+            for sequence in range(first, self.sequence):
+                offset = self.HEADER.size + (sequence % self.slots) * self.slot_bytes
+                data = self.map[offset:offset + self.slot_bytes].rstrip(b"\0")
+                if data:
+                    records.append(json.loads(data))
+            return records
+
+    def close(self):
+        self.map.close()
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def _number(value):
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+if __name__ == "__main__":
+    import sys
+
+    # Print the records of a span trace file, e.g. python3 metrics.py ~/.cache/skyforge/trace.bin
+    for entry in SpanTrace(sys.argv[1]).read():
+        print(json.dumps(entry))
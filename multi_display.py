@@ -0,0 +1,96 @@
+from startup_profile import StartupProfile  # First, so the profile times every import
+import os
+import re
+import json
+import logging
+
+from display_app import DisplayApp, stop_on_sigterm
+from display_backend import create_display
+from weather_display import app_settings
+from weather_service import WeatherGroup, Location
+from weather_store import SNAPSHOT_PATH
+
+logger = logging.getLogger(__name__)
+
+# Displays and their locations, e.g.
+# {"api_key": "...", "displays": [
+#   {"name": "hall", "cs": "CE0", "location": null, "pages": ["main", "hourly"]},
+#   {"name": "office", "cs": "CE1", "dc": "D23", "rst": "D22", "pages": ["main", "details"],
+#    "location": {"city": "ISTANBUL", "country": "TURKEY", "country_code": "TR",
+#                 "lat": 41.01, "lon": 28.95, "city_id": 745044}}]}
+# A null location is resolved by IP geolocation. backend (st7789, memory or file) and output
+# work as SKYFORGE_DISPLAY and SKYFORGE_DISPLAY_OUTPUT do for weather_display.py; every other
+# setting (pages and page_seconds when a display has none, cache durations, timeouts) comes
+# from weather_display.py
+CONFIG_PATH = os.environ.get("SKYFORGE_DISPLAYS",
+                             os.path.join(os.path.dirname(os.path.abspath(__file__)), "displays.json"))
+CACHE_DIR = os.path.dirname(SNAPSHOT_PATH)  # Per-location snapshots and histories go beside the single display's
+PIN_NAMES = ("cs", "dc", "rst")
+
+
+def load_config(path=CONFIG_PATH):
+    with open(path) as f:
+        config = json.load(f)
+    if not config.get("api_key") or not config.get("displays"):
+        raise ValueError(f"{path} needs an api_key and at least one display")
+    return config
+
+
+def location_slug(location):
+    """File name part for a location's snapshot and history: its city, or "ip" when located by IP"""
+    if not location:
+        return "ip"
+    return re.sub(r"[^a-z0-9]+", "-", location["city"].lower()).strip("-") or "location"
+
+
+class MultiDisplayApp(DisplayApp):
+    """DisplayApp with a screen per configured display and a site per distinct location.
+
+    Displays showing the same location share its weather store, snapshot and
+    history; current weather for locations with a city id comes from one group
+    request.
+    """
+
+    def __init__(self, config, **settings):
+        # The render pipeline drives a single panel
+        super().__init__(config["api_key"], **dict(settings, mode="minute", metrics_name="multi_display"))
+        self.config = config
+        self.panels = []  # (name, display config, display)
+
+    def open_displays(self):
+        # Panels reset on their own threads, all at once
+        for i, display in enumerate(self.config["displays"]):
+            name = display.get("name", f"display{i}")
+            pins = {pin: display[pin] for pin in PIN_NAMES if pin in display}
+            self.panels.append((name, display, create_display(display.get("backend", "st7789"),
+                                                              output=display.get("output", f"{name}.png"),
+                                                              background=True, **pins)))
+
+    def add_screens(self):
+        self.weather_group = WeatherGroup(self.data_client, self.api_key)
+        sites = {}
+        for name, display, panel in self.panels:
+            location = display.get("location")
+            slug = location_slug(location)
+            if slug not in sites:
+                if location and location.get("city_id"):
+                    self.weather_group.add(Location(**location), location["city_id"])  # Batched from the first refresh
+                sites[slug] = self.add_site(location, history_path=os.path.join(CACHE_DIR, f"history-{slug}.bin"),
+                                            snapshot_path=os.path.join(CACHE_DIR, f"snapshot-{slug}.json"))
+            pages = tuple(display.get("pages", self.pages))
+            page_seconds = dict(self.page_seconds or {}, **display.get("page_seconds", {}))
+            self.add_screen(name, panel, sites[slug], pages, page_seconds)
+            logger.info(f"Display {name}: {slug}, pages {', '.join(pages)}")
+        logger.info(f"Multi-display: {len(self.screens)} displays, {len(sites)} locations")
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    profile = StartupProfile()
+    profile.mark("imports")
+    stop_on_sigterm()
+    MultiDisplayApp(load_config(), profile=profile, **app_settings()).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from framebuffer import rgb565
+from metrics import read_proc_usage
+from renderer import BACKGROUND, HEIGHT, WIDTH
+from tick_scheduler import TICK_OFFSET, content_hash
+from weather_service import details_values, hourly_values, widget_values
+
+logger = logging.getLogger(__name__)
+
+# Page settings
+PAGE_CACHE_ENTRIES = 8  # Pre-rendered pages kept, least recently used dropped first
+TITLE_LINE = 38  # y of the line under a page title
+HOURLY_TOP = 44
+HOURLY_ROW = 34
+TABLE_TOP = 48
+TABLE_ROW = 52
+SPARKLINE_BOX = (10, 60, 230, 190)  # x0, y0, x1, y1
+SUMMARY_TOP = 206
+SUMMARY_ROW = 50
+SUMMARY_COLUMN = 75
+
+
+class Carousel:
+    """Cycles through pages on the wall clock, each shown for its own number of seconds"""
+
+    def __init__(self, pages, durations):
+        self.pages = pages
+        self.durations = [durations[page] for page in pages]
+        self.cycle = sum(self.durations)
+
+    def _position(self):
+        """(index of the current page, seconds left on it)"""
+        offset = time.time() % self.cycle
+        for index, duration in enumerate(self.durations):
+            if offset < duration:
+                return index, duration - offset
+            offset -= duration
+        return 0, self.durations[0]
+
+    def current(self):
+        return self.pages[self._position()[0]]
+
+    def delay(self):
+        """Seconds until just after the next page change, or None if there is only one page"""
+        if len(self.pages) < 2:
+            return None
+        return self._position()[1] + TICK_OFFSET
+
+
+class PageCache:
+    """Full-screen pages rendered to RGB565 buffers, keyed by page and content hash.
+
+    prerender() draws pages on a background thread as soon as their values
+    change, so showing a page is a framebuffer push with no drawing on the
+    critical path. A page whose values were never pre-rendered is drawn on the
+    spot.
+    """
+
+    def __init__(self, fonts, max_entries=PAGE_CACHE_ENTRIES):
+        self.fonts = fonts
+        self.max_entries = max_entries
+        self.stats = {"hits": 0, "misses": 0, "prerendered": 0}
+        self._entries = OrderedDict()
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pages")
+
+    def prerender(self, page, values):
+        """Queue page for drawing unless it is already cached (or queued) with these values"""
+        key = (page, content_hash(values))
+        with self._lock:
+            if key in self._entries or key in self._pending:
+                return
+            self._pending.add(key)
+        self._executor.submit(self._prerender, key, values)
+
+    def get(self, page, values):
+        """The RGB565 buffer for page with values"""
+        key = (page, content_hash(values))
+        with self._lock:
+            buffer = self._entries.get(key)
+            if buffer is not None:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return buffer
+            self.stats["misses"] += 1
+        return self._build(key, values)
+
+    def show(self, framebuffer, page, values):
+        """Push page to the display and return the bytes written"""
+        sent = framebuffer.push(source=self.get(page, values))
+        flush = getattr(framebuffer.display, "flush", None)
+        if flush:
+            flush()
+        return sent
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _prerender(self, key, values):
+        try:
+            self._build(key, values)
+            with self._lock:
+                self.stats["prerendered"] += 1
+        except Exception as e:
+            logger.error(f"Error pre-rendering {key[0]} page: {e}")
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+
+    def _build(self, key, values):
+        buffer = rgb565(render_page(key[0], values, self.fonts))
+        with self._lock:
+            self._entries[key] = buffer
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return buffer
+
+
+class PageData:
+    """Values of every page for one location's weather store"""
+
+    def __init__(self, weather_store, data_client, history, history_hours):
+        self.weather_store = weather_store
+        self.data_client = data_client
+        self.history = history
+        self.history_hours = history_hours
+        self.started = time.monotonic()
+
+    def values(self, page, frame, now):
+        if page == "main":
+            return widget_values(frame, now)
+        if page == "hourly":
+            return hourly_values(frame)
+        if page == "details":
+            return details_values(frame)
+        if page == "history":
+            return self.history_values()
+        return self.system_values()
+
+    def history_values(self):
+        """A temperature sparkline and summaries over history_hours.
+
+        The time axis ends at the newest observation, so the page only changes when one arrives.
+        """
+        title = f"LAST {self.history_hours} HOURS"
+        span = self.history_hours * 3600
+        records = self.history.window(span) if self.history is not None else ()
+        if len(records) == 0:
+            return {"title": title, "series": (), "rows": ()}
+        end = int(records["time"][-1])
+        records = self.history.window(span, now=end)
+        rows = []
+        temperature = self.history.summary(span, now=end)
+        if temperature:
+            rows += [("MIN", f"{temperature[0]:.1f}°C"), ("MAX", f"{temperature[1]:.1f}°C"),
+                     ("MEAN", f"{temperature[2]:.1f}°C")]
+        humidity = self.history.summary(span, "humidity", now=end)
+        if humidity:
+            rows.append(("HUMIDITY", f"{humidity[2]:.0f}%"))
+        pressure = self.history.summary(span, "pressure", now=end)
+        if pressure:
+            rows.append(("PRESSURE", f"{pressure[2]:.0f}"))
+        return {
+            "title": title,
+            "series": sparkline_points(records["time"], records["temperature"], end - span, end),
+            "rows": tuple(rows),
+        }
+
+    def system_values(self):
+        """Health figures in whole minutes, so the page changes at most once a minute"""
+        data_age = self.weather_store.age()
+        uptime = int(time.monotonic() - self.started) // 60
+        rss_bytes, _ = read_proc_usage(os.getpid())
+        counters = self.data_client.stats().values()
+        served = sum(c["hits"] + c["not_modified"] + c["coalesced"] for c in counters)
+        total = served + sum(c["misses"] for c in counters)
+        failures = self.weather_store.failures
+        return {
+            "title": "SYSTEM",
+            "rows": (
+                ("DATA AGE", f"{int(data_age // 60)} MIN" if data_age is not None else "--"),
+                ("REFRESH", f"{failures} FAILED" if failures else "OK"),
+                ("API CACHE HITS", f"{served / total:.0%}" if total else "--"),
+                ("UPTIME", f"{uptime // 60}H {uptime % 60:02d}M"),
+                ("MEMORY", f"{rss_bytes / 1048576:.0f} MB"),
+            ),
+        }
+
+
+def render_page(page, values, fonts):
+    """Draw a full-screen page as a PIL RGB image"""
+    image = Image.new("RGB", (WIDTH, HEIGHT), BACKGROUND)
+    draw = ImageDraw.Draw(image)
+    title_width = fonts["small"].getlength(values["title"])
+    draw.text(((WIDTH - title_width) // 2, 10), values["title"], font=fonts["small"], fill="white")
+    draw.line((10, TITLE_LINE, 230, TITLE_LINE), fill="white", width=2)
+    PAGE_LAYOUTS[page](image, draw, values, fonts)
+    return image
+
+
+def sparkline_points(times, values, start, end, box=SPARKLINE_BOX):
+    """Map a series onto pixel points in box: time start..end across, its min..max upwards"""
+    x0, y0, x1, y1 = box
+    keep = ~np.isnan(values)
+    times, values = times[keep], values[keep]
+    if values.size < 2 or end <= start:
+        return ()
+    low, high = values.min(), values.max()
+    xs = x0 + (times - start) * ((x1 - x0) / (end - start))
+    if high > low:
+        ys = y1 - (values - low) * ((y1 - y0) / (high - low))
+    else:
+        ys = np.full(values.shape, (y0 + y1) / 2)
+    return tuple(zip(np.rint(xs).astype(int).tolist(), np.rint(ys).astype(int).tolist()))
+
+
+def _draw_hourly(image, draw, values, fonts):
+    font = fonts["weather_temp"]
+    for i, (hour, temp, icon, rain) in enumerate(values["rows"]):
+        y = HOURLY_TOP + i * HOURLY_ROW
+        if y + HOURLY_ROW > HEIGHT:  # Screen boundary check
+            break
+        draw.text((10, y + 7), hour, font=font, fill="white")
+        if icon:
+            image.paste(icon, (85, y), icon)
+        draw.text((125, y + 7), temp, font=font, fill="orange")
+        draw.text((230 - font.getlength(rain), y + 7), rain, font=font, fill="cyan")
+
+
+def _draw_table(image, draw, values, fonts):
+    for i, (label, value) in enumerate(values["rows"]):
+        y = TABLE_TOP + i * TABLE_ROW
+        if y + TABLE_ROW > HEIGHT:  # Screen boundary check
+            break
+        draw.text((10, y), label, font=fonts["weekly"], fill="gray")
+        draw.text((10, y + 16), value, font=fonts["medium"], fill="yellow")
+
+
+def _draw_history(image, draw, values, fonts):
+    x0, y0, x1, y1 = SPARKLINE_BOX
+    draw.line((x0, y1, x1, y1), fill="gray", width=1)
+    if len(values["series"]) > 1:
+        draw.line(values["series"], fill="cyan", width=2)
+    else:
+        text = "COLLECTING DATA"
+        draw.text(((WIDTH - fonts["weekly"].getlength(text)) // 2, (y0 + y1) // 2), text,
+                  font=fonts["weekly"], fill="gray")
+    for i, (label, value) in enumerate(values["rows"]):
+        x = 10 + (i % 3) * SUMMARY_COLUMN
+        y = SUMMARY_TOP + (i // 3) * SUMMARY_ROW
+        draw.text((x, y), label, font=fonts["weekly"], fill="gray")
+        draw.text((x, y + 16), value, font=fonts["weather_temp"], fill="yellow")
+
+
+PAGE_LAYOUTS = {
+    "hourly": _draw_hourly,
+    "details": _draw_table,
+    "history": _draw_history,
+    "system": _draw_table,
+}
@@ -0,0 +1,216 @@
+import math
+import time
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+
+from renderer import WIDTH, WEEKLY_STEP
+from tick_scheduler import TICK_OFFSET
+
+logger = logging.getLogger(__name__)
+
+# Pipeline settings
+TARGET_FPS = 10
+FPS_WINDOW = 5.0  # Seconds of frames the achieved FPS is averaged over
+SLIDE_DURATION = 0.6  # Seconds a forecast card transition takes
+FORECAST_X = 10  # x of the first forecast card
+MAX_STALE_RECTS = 32
+
+
+class RenderPipeline:
+    """Renders and pushes frames on two threads, double buffered.
+
+    The render thread wakes on wall-clock frame boundaries, renders the values
+    produce(now) returns and converts the changed rectangles into whichever of
+    two RGB565 buffers the push thread is not sending. The push thread sends
+    the newest finished buffer over SPI. A frame is dropped when its boundary
+    passes before it could be rendered, or when a finished frame is replaced by
+    a newer one before it was pushed.
+
+    produce(now) returns renderer widget values, or None when it drew something
+    itself (e.g. renderer.render_error()). It runs on the render thread, which
+    owns the renderer while the pipeline runs.
+    """
+
+    def __init__(self, renderer, framebuffer, produce, fps=TARGET_FPS, metrics=None, display="display"):
+        self.renderer = renderer
+        self.framebuffer = framebuffer
+        self.produce = produce
+        self.period = 1.0 / fps
+        self.metrics = metrics
+        self.display = display  # frames_total label, as DisplayApp.record_frame uses
+        self.buffers = [framebuffer.new_buffer(), framebuffer.new_buffer()]
+        self.stale = [[], []]  # Rectangles each buffer has not caught up with yet
+        self.ready = None  # Buffer waiting to be pushed
+        self.pushing = None  # Buffer being pushed
+        self.frames = 0
+        self.pushed = 0
+        self.dropped = 0
+        self.errors = 0
+        self.timings = {"render": 0.0, "convert": 0.0, "push": 0.0}  # Seconds, last frame
+        self._frame_times = deque()
+        self._condition = threading.Condition()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._render_loop, name="render", daemon=True),
+            threading.Thread(target=self._push_loop, name="push", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        logger.info(f"Render pipeline started at {1 / self.period:g} fps")
+
+    def stop(self):
+        self._stop.set()
+        with self._condition:
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def fps(self):
+        """Frames rendered per second over the last FPS_WINDOW seconds"""
+        with self._condition:
+            self._trim(time.monotonic())
+            return len(self._frame_times) / FPS_WINDOW
+
+    def frame_latency(self):
+        """Seconds from rendering the last frame to the end of its push"""
+        return sum(self.timings.values())
+
+    def stats(self):
+        return {"fps": self.fps(), "frames": self.frames, "pushed": self.pushed,
+                "dropped": self.dropped, "errors": self.errors}
+
+    def log_stats(self):
+        stats = self.stats()
+        logger.info(f"Pipeline: {stats['fps']:.1f} fps (target {1 / self.period:g}), {stats['frames']} frames, "
+                    f"{stats['pushed']} pushed, {stats['dropped']} dropped")
+
+    def _render_loop(self):
+        tick = (math.floor(time.time() / self.period) + 1) * self.period + TICK_OFFSET
+        while not self._stop.is_set():
+            delay = tick - time.time()
+            if delay > 0 and self._stop.wait(delay):
+                break
+            missed = int((time.time() - tick) // self.period)
+            if missed > 0:  # Frame boundaries that passed while the last frame was rendered
+                self.dropped += missed
+                tick += missed * self.period
+            try:
+                self._render(datetime.fromtimestamp(tick))
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Error rendering frame: {e}")
+                self.renderer.full_redraw = True  # The frame may be half drawn
+            tick += self.period
+
+    def _render(self, now):
+        start = time.perf_counter()
+        values = self.produce(now)
+        if values is not None:
+            self.renderer.render(values)
+        rects, self.renderer.dirty = self.renderer.dirty, []
+        rendered = time.perf_counter()
+        self.timings["render"] = rendered - start
+
+        if rects:
+            for stale in self.stale:
+                stale.extend(rects)
+                if len(stale) > MAX_STALE_RECTS:  # A buffer left behind: rewrite it whole
+                    stale[:] = [(0, 0, self.framebuffer.width, self.framebuffer.height)]
+            with self._condition:
+                if self.ready is not None:  # Replaced before it was pushed
+                    self.dropped += 1
+                    index = self.ready
+                    self.ready = None
+                else:
+                    index = 1 if self.pushing == 0 else 0
+            # The buffer is neither ready nor being pushed: only this thread touches it
+            for rect in self.stale[index]:
+                self.framebuffer.convert(self.renderer.frame, rect, out=self.buffers[index])
+            self.stale[index] = []
+            self.timings["convert"] = time.perf_counter() - rendered
+            with self._condition:
+                self.ready = index
+                self._condition.notify()
+
+        with self._condition:
+            now = time.monotonic()
+            self._frame_times.append(now)
+            self._trim(now)
+        self.frames += 1
+        if self.metrics is not None:
+            self.metrics.observe("stage_seconds", self.timings["render"], stage="render")
+
+    def _push_loop(self):
+        flush = getattr(self.framebuffer.display, "flush", None)
+        while True:
+            with self._condition:
+                while self.ready is None and not self._stop.is_set():
+                    self._condition.wait()
+                if self._stop.is_set():
+                    return
+                index, self.ready = self.ready, None
+                self.pushing = index
+            start = time.perf_counter()
+            try:
+                self.framebuffer.push(source=self.buffers[index])
+                if flush:
+                    flush()
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Error pushing frame: {e}")
+                self.framebuffer.invalidate()
+            self.timings["push"] = time.perf_counter() - start
+            with self._condition:
+                self.pushing = None
+            self.pushed += 1
+            if self.metrics is not None:
+                self.metrics.observe("stage_seconds", self.timings["convert"] + self.timings["push"], stage="push")
+                self.metrics.inc("frames_total", display=self.display)
+
+    def _trim(self, now):
+        while self._frame_times and now - self._frame_times[0] > FPS_WINDOW:
+            self._frame_times.popleft()
+
+
+class CardSlide:
+    """Slides the forecast cards when the days or temperatures shown change.
+
+    The old cards move out to the left while the new ones come in from the
+    right, easing out over SLIDE_DURATION. Cards get their x position as a
+    fourth element while a slide runs.
+    """
+
+    def __init__(self, duration=SLIDE_DURATION):
+        self.duration = duration
+        self.cards = None
+        self.outgoing = ()
+        self.started = None
+
+    def apply(self, cards, now):
+        """Return the cards to draw at monotonic time now"""
+        if self.cards is not None and _card_text(cards) != _card_text(self.cards):
+            self.outgoing = self.cards
+            self.started = now
+        self.cards = cards
+        if self.started is None:
+            return cards
+
+        progress = (now - self.started) / self.duration
+        if progress >= 1:
+            self.started = None
+            self.outgoing = ()
+            return cards
+        shift = round((1 - (1 - progress) ** 3) * WIDTH)  # Ease out
+        return (tuple(card[:3] + (FORECAST_X + i * WEEKLY_STEP - shift,) for i, card in enumerate(self.outgoing))
+                + tuple(card[:3] + (FORECAST_X + i * WEEKLY_STEP + WIDTH - shift,) for i, card in enumerate(cards)))
+
+
+def _card_text(cards):
+    return tuple(card[:2] for card in cards)
@@ -0,0 +1,290 @@
+import time
+import logging
+import calendar
+import threading
+
+from PIL import Image, ImageChops, ImageDraw, ImageFont
+
+from text_cache import CLOCK_CHARSET, NUMBER_CHARSET
+
+logger = logging.getLogger(__name__)
+
+# Screen layout
+WIDTH = 240
+HEIGHT = 320
+BACKGROUND = "#100010"
+FONT_SIZES = {"large": 48, "medium": 20, "small": 19, "city_country": 14, "weather_temp": 16, "weekly": 12}
+WEEKLY_STEP = 46  # Horizontal distance between forecast cards
+WEEKLY_TEMP_INDENT = 5  # x of the high/low label within its card
+
+# Widget regions (x0, y0, x1, y1): everything a widget can ever touch
+REGIONS = {
+    "date": (0, 0, WIDTH, 38),
+    "day": (0, 38, WIDTH, 62),
+    "clock": (0, 62, WIDTH, 125),
+    "location": (0, 127, WIDTH, 185),  # Long country names run on under the flag
+    "flag": (196, 127, WIDTH, 185),
+    "conditions": (0, 187, WIDTH, 260),  # The 60x60 icon hangs over the bottom line
+    "forecast": (0, 255, WIDTH, HEIGHT),
+}
+SEPARATORS = (125, 185, 253)  # y of the horizontal lines
+
+# Stages reported in Renderer.timings
+STAGES = ("layout", "text", "icons", "convert", "push")
+
+
+_fonts = {}  # (path, size) -> loaded font, shared by every renderer and page in the process
+_fonts_lock = threading.Lock()
+
+
+def load_fonts(path, sizes=FONT_SIZES):
+    """The renderer's fonts by role, or PIL's default font if the TrueType file cannot be loaded.
+
+    Each size is loaded once per process; later calls return the same font objects,
+    so glyph atlases keyed by font are shared too.
+    """
+    with _fonts_lock:
+        try:
+            for size in set(sizes.values()):
+                if (path, size) not in _fonts:
+                    _fonts[(path, size)] = ImageFont.truetype(path, size)
+        except OSError:
+            logger.error("Orbitron font could not be loaded.")
+            return {name: ImageFont.load_default() for name in sizes}
+        return {name: _fonts[(path, size)] for name, size in sizes.items()}
+
+
+class _Canvas:
+    """Draws in screen coordinates onto an image that covers only part of the screen"""
+
+    def __init__(self, image, origin, timings, text_cache=None):
+        self.image = image
+        self.draw = ImageDraw.Draw(image)
+        self.x0, self.y0 = origin
+        self.timings = timings
+        self.text_cache = text_cache
+
+    def text(self, xy, text, font, fill):
+        start = time.perf_counter()
+        if self.text_cache is not None:
+            self.text_cache.draw(self.image, (xy[0] - self.x0, xy[1] - self.y0), text, font, fill)
+        else:
+            self.draw.text((xy[0] - self.x0, xy[1] - self.y0), text, font=font, fill=fill)
+        self.timings["text"] += time.perf_counter() - start
+
+    def line(self, xy, fill, width):
+        x0, y0, x1, y1 = xy
+        self.draw.line((x0 - self.x0, y0 - self.y0, x1 - self.x0, y1 - self.y0), fill=fill, width=width)
+
+    def paste(self, image, xy):
+        start = time.perf_counter()
+        self.image.paste(image, (xy[0] - self.x0, xy[1] - self.y0), image)
+        self.timings["icons"] += time.perf_counter() - start
+
+
+class Renderer:
+    """Retained-mode renderer for the main screen.
+
+    Keeps the last frame, redraws only widgets whose value changed and pushes
+    only the changed pixel rectangles to the display through the x/y offsets of
+    the ST7789 driver's image(). With a FrameBuffer the dirty rectangles are
+    converted to RGB565 with NumPy and narrowed further to changed row spans.
+    With a TextCache, text is blitted from cached sprites instead of being
+    rasterized by FreeType on every redraw.
+    """
+
+    def __init__(self, display, fonts, framebuffer=None, text_cache=None):
+        self.display = display
+        self.fonts = fonts
+        self.framebuffer = framebuffer
+        self.text_cache = text_cache
+        if text_cache is not None:
+            text_cache.add_atlas(fonts["large"], CLOCK_CHARSET)
+            text_cache.add_atlas(fonts["medium"], CLOCK_CHARSET)  # Seconds of the HH:MM:SS clock
+            text_cache.add_atlas(fonts["weekly"], NUMBER_CHARSET)
+            text_cache.warm(fonts["medium"], [name.upper() for name in calendar.day_name])
+            text_cache.warm(fonts["weekly"], calendar.day_abbr)
+        self.frame = Image.new("RGB", (WIDTH, HEIGHT), BACKGROUND)
+        self.values = {}
+        self.dirty = []
+        self.full_redraw = True
+        self._temp_widths = {}  # Forecast high/low label -> width in the weekly font
+        self.bytes_pushed = 0
+        self.timings = dict.fromkeys(STAGES, 0.0)  # Seconds spent per stage on the last frame
+        self.layers = [
+            ("date", self._draw_date),
+            ("day", self._draw_day),
+            ("clock", self._draw_clock),
+            (None, lambda canvas, _: canvas.line((10, SEPARATORS[0], 230, SEPARATORS[0]), fill="white", width=2)),
+            ("location", self._draw_location),
+            ("flag", self._draw_flag),
+            (None, lambda canvas, _: canvas.line((10, SEPARATORS[1], 230, SEPARATORS[1]), fill="white", width=2)),
+            ("conditions", self._draw_conditions),
+            (None, lambda canvas, _: canvas.line((10, SEPARATORS[2], 230, SEPARATORS[2]), fill="white", width=2)),
+            ("forecast", self._draw_forecast),
+        ]
+
+    def render(self, values):
+        """Update widget values and redraw the ones that changed. Returns the dirty rectangles."""
+        start = time.perf_counter()
+        self.timings = dict.fromkeys(STAGES, 0.0)
+        changed = [name for name, value in values.items()
+                   if self.full_redraw or name not in self.values or self.values[name] != value]
+        self.values.update(values)
+
+        if self.full_redraw:
+            self._compose((0, 0, WIDTH, HEIGHT))
+            self.dirty = [(0, 0, WIDTH, HEIGHT)]
+            self.full_redraw = False
+        else:
+            for name in changed:
+                rect = self._compose(REGIONS[name])
+                if rect:
+                    self.dirty.append(rect)
+
+        elapsed = time.perf_counter() - start
+        self.timings["layout"] = elapsed - self.timings["text"] - self.timings["icons"]
+        return self.dirty
+
+    def render_error(self, error_msg):
+        """Replace the whole screen with an error message; the next render() redraws everything"""
+        self.frame.paste(BACKGROUND, (0, 0, WIDTH, HEIGHT))
+        draw = ImageDraw.Draw(self.frame)
+        error_text = f"ERROR: {error_msg}"
+        text_width = self.fonts["medium"].getlength(error_text)
+        text_x = (WIDTH - text_width) // 2
+        draw.text((text_x, 150), error_text, font=self.fonts["medium"], fill="red")
+        self.dirty = [(0, 0, WIDTH, HEIGHT)]
+        self.full_redraw = True
+
+    def repaint(self):
+        """Send the whole retained frame on the next push(), e.g. after another page covered the screen"""
+        self.dirty = [(0, 0, WIDTH, HEIGHT)]
+
+    def push(self):
+        """Send the dirty rectangles to the display"""
+        pushed = len(self.dirty)
+        if self.framebuffer is not None:
+            start = time.perf_counter()
+            for rect in self.dirty:
+                self.framebuffer.convert(self.frame, rect)
+            converted = time.perf_counter()
+            self.bytes_pushed += self.framebuffer.push()
+            self.timings["convert"] = converted - start
+        else:
+            converted = time.perf_counter()
+            for x0, y0, x1, y1 in self.dirty:
+                self.display.image(self.frame.crop((x0, y0, x1, y1)), x=x0, y=y0)
+                self.bytes_pushed += (x1 - x0) * (y1 - y0) * 2  # RGB565
+        flush = getattr(self.display, "flush", None)
+        if flush:
+            flush()
+        self.timings["push"] = time.perf_counter() - converted
+        self.dirty = []
+        return pushed
+
+    def _compose(self, rect):
+        """Redraw every layer that overlaps rect and copy the result into the frame.
+
+        Returns the bounding box of pixels that actually changed, or None.
+        """
+        x0, y0, x1, y1 = rect
+        scratch = Image.new("RGB", (x1 - x0, y1 - y0), BACKGROUND)
+        canvas = _Canvas(scratch, (x0, y0), self.timings, self.text_cache)
+        for name, draw_layer in self.layers:
+            if name is None:
+                draw_layer(canvas, None)
+            elif name in self.values and _overlaps(REGIONS[name], rect):
+                draw_layer(canvas, self.values[name])
+
+        bbox = ImageChops.difference(scratch, self.frame.crop(rect)).getbbox()
+        if bbox is None:
+            return None
+        changed = (x0 + bbox[0], y0 + bbox[1], x0 + bbox[2], y0 + bbox[3])
+        self.frame.paste(scratch.crop(bbox), changed[:2])
+        return changed
+
+    def _text_width(self, font, text):
+        if self.text_cache is not None:
+            return self.text_cache.measure(font, text)
+        return font.getlength(text)
+
+    def _text_bottom(self, font, text):
+        if self.text_cache is not None:
+            return self.text_cache.bottom(font, text)
+        return font.getbbox(text)[3]
+
+    def _centered(self, canvas, y, text, font, fill):
+        text_width = self._text_width(font, text)
+        canvas.text(((WIDTH - text_width) // 2, y), text, font=font, fill=fill)
+
+    def _draw_date(self, canvas, current_date):
+        self._centered(canvas, 10, current_date, self.fonts["small"], "white")
+
+    def _draw_day(self, canvas, current_day):
+        self._centered(canvas, 40, current_day, self.fonts["medium"], "lime")
+
+    def _draw_clock(self, canvas, current_time):
+        if len(current_time) <= 5:
+            self._centered(canvas, 62, current_time, self.fonts["large"], "cyan")
+            return
+        # HH:MM:SS does not fit in the large font: seconds follow in the medium font, bottom aligned
+        hours_minutes, seconds = current_time[:5], current_time[5:]
+        large, medium = self.fonts["large"], self.fonts["medium"]
+        hours_minutes_width = self._text_width(large, hours_minutes)
+        x = int((WIDTH - hours_minutes_width - self._text_width(medium, seconds)) // 2)
+        seconds_y = 62 + self._text_bottom(large, hours_minutes) - self._text_bottom(medium, seconds)
+        canvas.text((x, 62), hours_minutes, font=large, fill="cyan")
+        canvas.text((int(x + hours_minutes_width), seconds_y), seconds, font=medium, fill="cyan")
+
+    def _draw_location(self, canvas, location):
+        city, country = location
+        canvas.text((10, 134), city, font=self.fonts["city_country"], fill="yellow")
+        canvas.text((10, 159), country, font=self.fonts["city_country"], fill="orange")
+
+    def _draw_flag(self, canvas, flag):
+        if flag:
+            canvas.paste(flag, (200, 144))
+
+    def _draw_conditions(self, canvas, conditions):
+        weather, temperature, icon, age = conditions
+        canvas.text((10, 195), weather, font=self.fonts["weather_temp"], fill="yellow")
+        canvas.text((10, 220), temperature, font=self.fonts["weather_temp"], fill="orange")
+        if age:  # How old the data is, between the temperature and the icon
+            temperature_width = self._text_width(self.fonts["weather_temp"], temperature)
+            canvas.text((int(18 + temperature_width), 223), age, font=self.fonts["weekly"], fill="gray")
+        if icon:
+            canvas.paste(icon, (175, 200))
+
+    def _draw_forecast(self, canvas, cards):
+        """Cards are (day, temp, icon), or (day, temp, icon, x) to place them freely (slide transitions)"""
+        x_offset = 10
+        for card in cards:
+            day, temp, icon = card[:3]
+            if len(card) > 3:
+                x_offset = card[3]
+                if x_offset >= WIDTH or x_offset + WEEKLY_STEP <= 0:
+                    continue
+            elif x_offset + WEEKLY_STEP > WIDTH:  # Screen boundary check
+                break
+            # A sliding card keeps its label while it crosses the screen edge
+            right = x_offset + WEEKLY_STEP if len(card) > 3 else min(x_offset + WEEKLY_STEP, WIDTH)
+            canvas.text((x_offset, 260), day, font=self.fonts["weekly"], fill="white")
+            canvas.text((x_offset + WEEKLY_TEMP_INDENT, 275), self._fit_temp(temp, right - x_offset),
+                        font=self.fonts["weekly"], fill="cyan")
+            if icon:
+                canvas.paste(icon, (x_offset, 290))
+            x_offset += WEEKLY_STEP
+
+    def _fit_temp(self, temp, card_width):
+        """The high/low label, or the high alone when the pair is wider than the card"""
+        width = self._temp_widths.get(temp)
+        if width is None:
+            width = self._temp_widths[temp] = self.fonts["weekly"].getlength(temp)
+        if WEEKLY_TEMP_INDENT + width > card_width:
+            return temp.split("/")[0]
+        return temp
+
+
+def _overlaps(a, b):
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
@@ -0,0 +1,168 @@
+import os
+import json
+import time
+import fcntl
+import logging
+import threading
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Budget settings
+BUDGET_PATH = os.path.expanduser("~/.cache/skyforge/budget.json")
+HOST_LIMITS = {  # (calls, per seconds) limits per upstream host, all of which must allow a call
+    "api.openweathermap.org": [(60, 60), (1000000, 30 * 86400)],  # Free tier
+    "ip-api.com": [(45, 60)],
+}
+ENDPOINT_PRIORITIES = {  # Lower is more important
+    "location": 0,
+    "weather": 0,
+    "forecast": 1,
+    "icon": 2,
+    "flag": 2,
+}
+PRIORITY_RESERVES = (0.0, 0.1, 0.25)  # Share of each bucket kept back from this priority and below
+
+
+class BudgetExceeded(requests.exceptions.RequestException):
+    """Raised instead of making a call the host's budget cannot afford"""
+
+
+class RequestBudget:
+    """Token buckets per upstream host, shared by every process through one state file.
+
+    Each host can have several (calls, per seconds) limits. A call takes one
+    token from each of them; less important endpoints must leave a reserve in
+    every bucket, so the current weather still gets through when the budget is
+    nearly spent. The bucket levels live in a locked JSON file, so restarts
+    and other displays on the same key draw from the same budget.
+    share scales every limit, for splitting one API key between several units.
+    """
+
+    def __init__(self, path=BUDGET_PATH, limits=None, share=1.0):
+        self.path = path
+        self.share = share
+        self.limits = dict(HOST_LIMITS if limits is None else limits)
+        self.counters = {}
+        self._memory_state = {}  # Used when the state file cannot be written
+        self._lock = threading.Lock()
+
+    def take(self, host, endpoint):
+        """Spend one token for a call to host, or raise BudgetExceeded"""
+        limits = self.limits.get(host)
+        if not limits:
+            return
+        priority = ENDPOINT_PRIORITIES.get(endpoint, len(PRIORITY_RESERVES) - 1)
+        reserve = PRIORITY_RESERVES[min(priority, len(PRIORITY_RESERVES) - 1)]
+
+        with self._lock, self._state() as state:
+            buckets = self._refill(state, host, limits)
+            if any(level - 1 < reserve * capacity for level, capacity in buckets):
+                self._count(host, "denied")
+                raise BudgetExceeded(f"Request budget for {host} exhausted ({endpoint} call skipped)")
+            for bucket in state[host]:
+                bucket["tokens"] -= 1
+            self._count(host, "allowed")
+
+    def exhaust(self, host):
+        """Empty the host's buckets after it answered 429 Too Many Requests"""
+        limits = self.limits.get(host)
+        if not limits:
+            return
+        with self._lock, self._state() as state:
+            self._refill(state, host, limits)
+            for bucket in state[host]:
+                bucket["tokens"] = 0.0
+            self._count(host, "throttled")
+        logger.warning(f"{host} is rate limiting us, pausing calls until its budget refills")
+
+    def levels(self):
+        """Remaining tokens per host, as a fraction of each bucket's capacity"""
+        with self._lock, self._state() as state:
+            return {
+                host: [level / capacity for level, capacity in self._refill(state, host, limits)]
+                for host, limits in self.limits.items()
+            }
+
+    def stats(self):
+        with self._lock:
+            return {host: dict(counters) for host, counters in self.counters.items()}
+
+    def log_stats(self):
+        levels = self.levels()
+        for host, counters in sorted(self.stats().items()):
+            remaining = ", ".join(f"{level:.0%}" for level in levels.get(host, []))
+            logger.info(
+                f"{host}: {counters['allowed']} calls, {counters['denied']} over budget, "
+                f"{counters['throttled']} throttled, budget left {remaining}"
+            )
+
+    def _refill(self, state, host, limits):
+        """Top up the host's buckets for the time passed; returns [(tokens, capacity)]"""
+        now = time.time()
+        buckets = state.get(host)
+        if not buckets or len(buckets) != len(limits):
+            buckets = state[host] = [{"tokens": calls * self.share, "updated": now} for calls, _ in limits]
+        levels = []
+        for bucket, (calls, period) in zip(buckets, limits):
+            capacity = calls * self.share
+            elapsed = max(0.0, now - bucket["updated"])
+            bucket["tokens"] = min(capacity, bucket["tokens"] + elapsed * capacity / period)
+            bucket["updated"] = now
+            levels.append((bucket["tokens"], capacity))
+        return levels
+
+    def _state(self):
+        return _StateFile(self.path, self._memory_state)
+
+    def _count(self, host, counter):
+        counters = self.counters.setdefault(host, {"allowed": 0, "denied": 0, "throttled": 0})
+        counters[counter] += 1
+
+
+class _StateFile:
+    """Read-modify-write of the bucket state under an exclusive file lock"""
+
+    def __init__(self, path, fallback):
+        self.path = path
+        self.fallback = fallback
+        self.lock_file = None
+        self.state = None
+
+    def __enter__(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self.lock_file = open(f"{self.path}.lock", "w")
+            fcntl.flock(self.lock_file, fcntl.LOCK_EX)
+            with open(self.path) as f:
+                self.state = json.load(f)
+        except FileNotFoundError:
+            self.state = {}
+        except ValueError as e:
+            logger.warning(f"Resetting unreadable request budget {self.path}: {e}")
+            self.state = {}
+        except OSError as e:
+            logger.warning(f"Request budget state unavailable, keeping it in memory: {e}")
+            self._unlock()
+            self.state = self.fallback
+        return self.state
+
+    def __exit__(self, exc_type, exc, traceback):
+        if self.lock_file is None:
+            return False
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(self.state, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Could not write request budget {self.path}: {e}")
+        finally:
+            self._unlock()
+        return False
+
+    def _unlock(self):
+        if self.lock_file is not None:
+            self.lock_file.close()  # Closing releases the lock
+            self.lock_file = None
@@ -0,0 +1,61 @@
+import logging
+
+from pages import Carousel
+from tick_scheduler import FrameGate
+
+logger = logging.getLogger(__name__)
+
+
+class Screen:
+    """One display and the carousel of pages it shows for one location's weather store.
+
+    The main page is drawn by the screen's own retained renderer; the other
+    pages come from a page cache, which may be shared between screens.
+    """
+
+    def __init__(self, name, renderer, weather_store, page_data, page_cache, pages=("main",), page_seconds=None):
+        self.name = name
+        self.renderer = renderer
+        self.weather_store = weather_store
+        self.page_data = page_data
+        self.page_cache = page_cache
+        self.carousel = Carousel(pages, page_seconds or dict.fromkeys(pages, 10))
+        self.frame_gate = FrameGate()
+        self.shown_page = "main"
+
+    def update(self, now, frame=None):
+        """Draw whatever changed and return the page drawn, "error", or None if nothing changed"""
+        frame = frame or self.weather_store.frame()
+        if frame["location"] is None:
+            # Nothing good has ever been fetched: nothing to show but the error
+            error_message = self.weather_store.last_error or "TIMEOUT - CONNECTION ERROR"
+            if not self.frame_gate.changed({"error": error_message}):
+                return None
+            self.renderer.render_error(error_message)
+            self.renderer.push()
+            self.shown_page = "error"
+            return "error"
+
+        # Only widgets whose value changed are redrawn and sent over SPI; other pages come
+        # pre-rendered from the page cache
+        page = self.carousel.current()
+        values = self.page_data.values(page, frame, now)
+        drawn = None
+        if self.frame_gate.changed(dict(values, page=page)):
+            if page == "main":
+                if self.shown_page != "main":
+                    self.renderer.repaint()
+                self.renderer.render(values)
+                self.renderer.push()
+            else:
+                self.page_cache.show(self.renderer.framebuffer, page, values)
+            self.shown_page = drawn = page
+            logger.info(f"{self.name}: {page} page ({self.renderer.framebuffer.bytes_pushed} bytes sent so far)")
+        for name in self.carousel.pages:
+            if name not in ("main", page):
+                self.page_cache.prerender(name, self.page_data.values(name, frame, now))
+        return drawn
+
+    def delay(self):
+        """Seconds until the next page change, or None if the screen has a single page"""
+        return self.carousel.delay()
@@ -102,6 +102,7 @@ install_python_dependencies() {
     local system_packages=(
         "python3-requests"
         "python3-pil"
+        "python3-numpy"
         "python3-rpi.gpio"
     )
     
@@ -161,7 +162,7 @@ create_project_directory() {
 copy_project_files() {
     print_status "Copying project files..."
     
-    local files=("system_controller.py" "weather_display.py" "led_controller.py" "Orbitron-Bold.ttf" "weather-display.service")
+    local files=("system_controller.py" "weather_display.py" "display_app.py" "startup_profile.py" "led_controller.py" "asset_cache.py" "data_client.py" "fetch_stage.py" "renderer.py" "framebuffer.py" "display_backend.py" "weather_service.py" "text_cache.py" "led_patterns.py" "status_bus.py" "weather_store.py" "request_budget.py" "location_cache.py" "metrics.py" "tick_scheduler.py" "asset_pack.py" "render_pipeline.py" "pages.py" "weather_history.py" "forecast_days.py" "screen.py" "multi_display.py" "Orbitron-Bold.ttf" "weather-display.service")
     local current_dir=$(pwd)
     
     for file in "${files[@]}"; do
@@ -176,6 +177,18 @@ copy_project_files() {
     done
 }
 
+# Function to build the offline icon and flag pack
+build_asset_pack() {
+    print_status "Building offline weather icon and flag pack..."
+    
+    if (cd "$PROJECT_DIR" && python3 asset_pack.py --output "$PROJECT_DIR/assets.pack"); then
+        print_success "Asset pack built: $PROJECT_DIR/assets.pack"
+    else
+        print_warning "Some icons or flags could not be downloaded; they will be fetched at runtime"
+        print_warning "Re-run later with: cd $PROJECT_DIR && python3 asset_pack.py"
+    fi
+}
+
 # Function to install font
 install_font() {
     print_status "Installing Orbitron font..."
@@ -370,6 +383,7 @@ main() {
     enable_spi
     create_project_directory
     copy_project_files
+    build_asset_pack
     install_font
     setup_systemd_service
     setup_api_key
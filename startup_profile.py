@@ -0,0 +1,63 @@
+import os
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Startup profile settings
+PROFILE_STARTUP = os.environ.get("SKYFORGE_PROFILE_STARTUP") == "1"  # Report startup phases and exit
+STARTUP_BUDGET = 1.0  # Seconds from process start to the first frame on the panel
+IMPORTED_AT = time.monotonic()  # Entry points import this module first, before anything heavy
+
+
+def process_age():
+    """Seconds since the kernel started this process, or None where /proc is unavailable"""
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])  # Field 22, starttime
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+    return max(0.0, uptime - start_ticks / os.sysconf("SC_CLK_TCK"))
+
+
+class StartupProfile:
+    """Wall-clock phases from process start to the first frame.
+
+    mark() ends the phase running on the calling thread; add() records work
+    timed separately, such as panel initialization on its own thread.
+    """
+
+    def __init__(self):
+        age = process_age()
+        self.started = time.monotonic() - age if age is not None else IMPORTED_AT
+        self.phases = [("interpreter", max(0.0, IMPORTED_AT - self.started))]
+        self.background = []
+        self._last = max(IMPORTED_AT, self.started)
+
+    def mark(self, phase):
+        now = time.monotonic()
+        self.phases.append((phase, now - self._last))
+        self._last = now
+
+    def add(self, phase, seconds):
+        self.background.append((phase, seconds))
+
+    def total(self):
+        """Seconds from process start to the last mark"""
+        return self._last - self.started
+
+    def report(self):
+        phases = ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in self.phases)
+        logger.info(f"First frame {self.total():.3f} s after start ({phases})")
+        for name, seconds in self.background:
+            logger.info(f"  {name}: {seconds * 1000:.0f} ms")
+        if self.total() > STARTUP_BUDGET:
+            logger.warning(f"Startup over budget: {self.total():.3f} s > {STARTUP_BUDGET:.1f} s")
+
+    def record(self, metrics):
+        """Export every phase as a startup_seconds gauge"""
+        for name, seconds in self.phases + self.background:
+            metrics.set("startup_seconds", seconds, phase=name)
+        metrics.set("startup_seconds", self.total(), phase="total")
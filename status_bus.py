@@ -0,0 +1,96 @@
+import os
+import json
+import time
+import errno
+import socket
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Every subscriber binds one Unix datagram socket in this directory
+STATUS_DIR = os.environ.get("SKYFORGE_RUN_DIR", "/tmp/skyforge")
+SUBSCRIBERS = ("led", "supervisor")
+MAX_MESSAGE_BYTES = 4096
+
+# Display states, from best to worst
+STATE_OK = "ok"  # Every item fetched on time
+STATE_STALE = "stale"  # Showing data, but some of it is old or missing
+STATE_ERROR = "error"  # Error screen
+STATE_DOWN = "down"  # Display process not running
+
+
+def socket_path(name):
+    return os.path.join(STATUS_DIR, f"{name}.sock")
+
+
+class StatusPublisher:
+    """Sends status datagrams to every subscriber socket that currently exists.
+
+    Sending never blocks: a missing or busy subscriber simply misses the update.
+    """
+
+    def __init__(self, source, subscribers=SUBSCRIBERS):
+        self.source = source
+        self.subscribers = subscribers
+        self.sequence = 0
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+
+    def publish(self, state, **fields):
+        self.sequence += 1
+        message = dict(fields, source=self.source, state=state, seq=self.sequence, time=time.time())
+        data = json.dumps(message, separators=(",", ":")).encode()
+        for name in self.subscribers:
+            try:
+                self.sock.sendto(data, socket_path(name))
+            except OSError as e:
+                if e.errno not in (errno.ENOENT, errno.ECONNREFUSED, errno.EAGAIN):
+                    logger.warning(f"Could not send status to {name}: {e}")
+
+    def close(self):
+        self.sock.close()
+
+
+class StatusSubscriber:
+    """Receives status datagrams on this process's own socket"""
+
+    def __init__(self, name):
+        self.path = socket_path(name)
+        self.latest = None
+        self.received_at = None  # Monotonic time of the last message
+        os.makedirs(STATUS_DIR, exist_ok=True)
+        try:
+            os.unlink(self.path)  # Left over from a previous run
+        except FileNotFoundError:
+            pass
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.sock.bind(self.path)
+
+    def receive(self, timeout=None):
+        """Block until a message arrives (or timeout) and return it, or None on timeout"""
+        self.sock.settimeout(timeout)
+        try:
+            data = self.sock.recv(MAX_MESSAGE_BYTES)
+        except socket.timeout:
+            return None
+        try:
+            message = json.loads(data)
+        except ValueError:
+            logger.warning("Ignoring malformed status message")
+            return None
+        self.latest = message
+        self.received_at = time.monotonic()
+        return message
+
+    def age(self):
+        """Seconds since the last message, or None if nothing has arrived yet"""
+        if self.received_at is None:
+            return None
+        return time.monotonic() - self.received_at
+
+    def close(self):
+        self.sock.close()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
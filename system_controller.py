@@ -1,174 +1,311 @@
-import multiprocessing
-import subprocess
+import queue
 import signal
+import subprocess
 import sys
+import threading
 import time
 import logging
+from collections import deque
 from pathlib import Path
+from status_bus import StatusPublisher, StatusSubscriber, STATE_DOWN
+from metrics import Metrics, METRICS_PORT, read_proc_usage, textfile_path
 
 # Logging setup
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Supervised scripts, with the status bus source each one reports as (if any)
+SERVICES = [
+    ("Weather display", "weather_display.py", "display"),
+    ("LED control", "led_controller.py", None),
+]
+
+# Restart policy: at most RESTART_LIMIT restarts per child in any RESTART_WINDOW seconds
+RESTART_LIMIT = 5
+RESTART_WINDOW = 300
+RESTART_BACKOFF = 5  # Seconds added per recent restart, the first restart is immediate
+MAX_RESTART_DELAY = 30
+STOP_TIMEOUT = 5  # Seconds to wait after SIGTERM before SIGKILL
+STATS_INTERVAL = 300  # Seconds between child statistics reports
+HEALTH_CHECK_INTERVAL = 60
+HEALTH_TIMEOUT = 300  # Restart a reporting child that has been silent this long
+METRICS_INTERVAL = 60  # Seconds between metrics file updates
+
 # Global variables for process management
-process_a = None
-process_b = None
+children = []
+exit_events = queue.Queue()
 shutdown_requested = False
+status_subscriber = None
+status_publisher = None
+
+
+class Child:
+    """One supervised script, started directly as a single interpreter"""
+
+    def __init__(self, name, script, status_source=None):
+        self.name = name
+        self.script = script
+        self.status_source = status_source
+        self.process = None
+        self.started_at = None
+        self.restart_count = 0
+        self.recent_restarts = deque()
+        self.restart_at = None  # Monotonic time of a scheduled restart
+
+    def start(self):
+        logger.info(f"Starting {self.script} (restart #{self.restart_count})" if self.restart_count
+                    else f"Starting {self.script}")
+        self.process = subprocess.Popen([sys.executable, self.script])
+        self.started_at = time.monotonic()
+        self.restart_at = None
+        # Blocks in waitpid until the child exits, then wakes the supervisor
+        threading.Thread(target=wait_for_exit, args=(self, self.process), daemon=True,
+                         name=f"wait-{self.script}").start()
+
+    def is_running(self):
+        return self.process is not None and self.process.poll() is None
+
+    def schedule_restart(self):
+        """Record the exit and pick a restart time under the sliding-window limit"""
+        now = time.monotonic()
+        while self.recent_restarts and now - self.recent_restarts[0] > RESTART_WINDOW:
+            self.recent_restarts.popleft()
+
+        delay = min(MAX_RESTART_DELAY, RESTART_BACKOFF * len(self.recent_restarts))
+        if len(self.recent_restarts) >= RESTART_LIMIT:
+            window_opens = self.recent_restarts[0] + RESTART_WINDOW - now
+            delay = max(delay, window_opens)
+            logger.critical(f"{self.script} restarted {RESTART_LIMIT} times in {RESTART_WINDOW}s, "
+                            f"holding off for {delay:.0f} seconds")
+        elif delay:
+            logger.info(f"Restarting {self.script} in {delay:.0f} seconds...")
+
+        self.restart_at = now + delay
+
+    def restart(self):
+        self.recent_restarts.append(time.monotonic())
+        self.restart_count += 1
+        self.start()
+
+    def stats(self):
+        """Uptime, restart count, RSS and CPU time of the running child"""
+        report = {
+            "name": self.name,
+            "pid": self.process.pid if self.is_running() else None,
+            "uptime": time.monotonic() - self.started_at if self.is_running() else 0.0,
+            "restarts": self.restart_count,
+            "rss_bytes": 0,
+            "cpu_seconds": 0.0,
+        }
+        if report["pid"] is not None:
+            report["rss_bytes"], report["cpu_seconds"] = read_proc_usage(report["pid"])
+        return report
+
+    def stop(self):
+        if not self.is_running():
+            return
+        logger.info(f"Terminating {self.name.lower()} process...")
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=STOP_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            logger.warning(f"Force killing {self.name.lower()} process...")
+            self.process.kill()
+            self.process.wait()
+
+
+def wait_for_exit(child, process):
+    returncode = process.wait()
+    exit_events.put((child, process, returncode))
+
+
+def receive_status():
+    """Keep the latest status bus message and log state changes"""
+    last_state = None
+    while not shutdown_requested:
+        try:
+            message = status_subscriber.receive()
+        except OSError:
+            break
+        if message and message.get("state") != last_state:
+            last_state = message.get("state")
+            logger.info(f"Status from {message.get('source')}: {last_state}")
+
+
+def check_health(child):
+    """Restart a running child whose status reports have stopped"""
+    if status_subscriber is None or child.status_source is None or not child.is_running():
+        return
+    silent_for = status_subscriber.age()
+    if silent_for is None or time.monotonic() - child.started_at < silent_for:
+        silent_for = time.monotonic() - child.started_at
+    if silent_for > HEALTH_TIMEOUT:
+        logger.error(f"{child.name} has not reported status for {silent_for:.0f}s, restarting it")
+        child.stop()  # Its waiter thread reports the exit and schedules the restart
+
 
 def signal_handler(signum, frame):
     """Handle termination signals gracefully"""
     global shutdown_requested
     logger.info(f"Received signal {signum}, initiating graceful shutdown...")
     shutdown_requested = True
-    
+
     # Terminate child processes
     terminate_processes()
     sys.exit(0)
 
+
 def terminate_processes():
     """Terminate all child processes gracefully"""
-    global process_a, process_b
-    
-    if process_a and process_a.is_alive():
-        logger.info("Terminating weather display process...")
-        process_a.terminate()
-        process_a.join(timeout=5)  # Wait up to 5 seconds
-        if process_a.is_alive():
-            logger.warning("Force killing weather display process...")
-            process_a.kill()
-    
-    if process_b and process_b.is_alive():
-        logger.info("Terminating LED control process...")
-        process_b.terminate()
-        process_b.join(timeout=5)  # Wait up to 5 seconds
-        if process_b.is_alive():
-            logger.warning("Force killing LED control process...")
-            process_b.kill()
-
-def run_script_with_restart(script_name, max_restarts=5):
-    """Run a script with automatic restart capability"""
-    restart_count = 0
-    
-    while not shutdown_requested and restart_count < max_restarts:
-        try:
-            logger.info(f"Starting {script_name} (attempt {restart_count + 1})")
-            result = subprocess.run(
-                ["python3", script_name], 
-                check=False,  # Don't raise exception on non-zero exit
-                capture_output=False,  # Allow real-time output
-                timeout=None  # No timeout
-            )
-            
-            if result.returncode != 0:
-                logger.error(f"{script_name} exited with code {result.returncode}")
-            else:
-                logger.info(f"{script_name} completed normally")
-                
-        except subprocess.TimeoutExpired:
-            logger.error(f"{script_name} timed out")
-        except Exception as e:
-            logger.error(f"Error running {script_name}: {e}")
-        
-        restart_count += 1
-        
-        if not shutdown_requested and restart_count < max_restarts:
-            wait_time = min(30, restart_count * 5)  # Progressive backoff
-            logger.info(f"Restarting {script_name} in {wait_time} seconds...")
-            time.sleep(wait_time)
-    
-    if restart_count >= max_restarts:
-        logger.critical(f"{script_name} failed {max_restarts} times, giving up")
-
-def run_weather_display():
-    """Run weather display script with restart capability"""
-    run_script_with_restart("weather_display.py")
-
-def run_led_controller():
-    """Run LED control script with restart capability"""
-    run_script_with_restart("led_controller.py")
+    for child in children:
+        child.stop()
+
 
 def check_script_files():
     """Check if required script files exist"""
-    scripts = ["weather_display.py", "led_controller.py"]
-    missing_scripts = []
-    
-    for script in scripts:
-        if not Path(script).exists():
-            missing_scripts.append(script)
-    
+    missing_scripts = [script for _, script, _ in SERVICES if not Path(script).exists()]
+
     if missing_scripts:
         logger.error(f"Missing script files: {missing_scripts}")
         return False
-    
+
     logger.info("All required script files found")
     return True
 
-def monitor_processes():
-    """Monitor child processes and restart if needed"""
-    global process_a, process_b
-    
+
+def log_child_stats():
+    for child in children:
+        stats = child.stats()
+        logger.info(
+            f"{stats['name']}: pid {stats['pid']}, up {stats['uptime']:.0f}s, "
+            f"{stats['restarts']} restarts, RSS {stats['rss_bytes'] / 1048576:.1f} MB, "
+            f"CPU {stats['cpu_seconds']:.1f}s"
+        )
+
+
+def collect_child_metrics(metrics):
+    """Restart counts, uptime and resource usage of every child, labelled by script"""
+    for child in children:
+        stats = child.stats()
+        metrics.set("child_restarts_total", stats["restarts"], script=child.script)
+        metrics.set("child_up", 1 if stats["pid"] is not None else 0, script=child.script)
+        metrics.set("child_uptime_seconds", stats["uptime"], script=child.script)
+        metrics.set("child_resident_memory_bytes", stats["rss_bytes"], script=child.script)
+        metrics.set("child_cpu_seconds_total", stats["cpu_seconds"], script=child.script)
+
+
+def create_metrics():
+    metrics = Metrics()
+    metrics.describe("child_restarts_total", "counter", "Restarts of each supervised script")
+    metrics.describe("child_up", "gauge", "Whether each supervised script is running")
+    metrics.describe("child_uptime_seconds", "gauge", "Seconds since each script was last started")
+    metrics.describe("child_resident_memory_bytes", "gauge", "Resident set size of each script")
+    metrics.describe("child_cpu_seconds_total", "counter", "User and system CPU time of each script")
+    metrics.add_collector(collect_child_metrics)
+    if METRICS_PORT:
+        try:
+            metrics.serve(METRICS_PORT + 1)
+        except OSError as e:
+            logger.warning(f"Could not serve supervisor metrics: {e}")
+    return metrics
+
+
+def supervise():
+    """Sleep until a child exits, a restart is due or stats are due, and handle it"""
+    next_stats = time.monotonic() + STATS_INTERVAL
+    next_health = time.monotonic() + HEALTH_CHECK_INTERVAL
+    next_metrics = time.monotonic()
+    metrics = create_metrics()
+    metrics_file = textfile_path("supervisor")
+
     while not shutdown_requested:
+        now = time.monotonic()
+        deadlines = [next_stats, next_health, next_metrics] + [
+            child.restart_at for child in children if child.restart_at is not None
+        ]
         try:
-            # Check process A (weather display)
-            if process_a and not process_a.is_alive():
-                exit_code = process_a.exitcode
-                logger.warning(f"Weather display process died (exit code: {exit_code})")
-                process_a = multiprocessing.Process(target=run_weather_display)
-                process_a.start()
-                logger.info("Weather display process restarted")
-            
-            # Check process B (LED control)
-            if process_b and not process_b.is_alive():
-                exit_code = process_b.exitcode
-                logger.warning(f"LED control process died (exit code: {exit_code})")
-                process_b = multiprocessing.Process(target=run_led_controller)
-                process_b.start()
-                logger.info("LED control process restarted")
-            
-            time.sleep(10)  # Check every 10 seconds
-            
-        except Exception as e:
-            logger.error(f"Error in process monitoring: {e}")
-            time.sleep(5)
+            child, process, returncode = exit_events.get(timeout=max(0.0, min(deadlines) - now))
+        except queue.Empty:
+            child = None
+
+        if shutdown_requested:
+            break
+
+        if child is not None and process is child.process:
+            uptime = time.monotonic() - child.started_at
+            logger.warning(f"{child.name} process died (exit code: {returncode}) after {uptime:.0f}s")
+            if child.status_source and status_publisher:
+                status_publisher.publish(STATE_DOWN, exit_code=returncode)
+            child.schedule_restart()
+
+        now = time.monotonic()
+        for pending in children:
+            if pending.restart_at is not None and pending.restart_at <= now:
+                try:
+                    pending.restart()
+                    logger.info(f"{pending.name} process restarted")
+                except OSError as e:
+                    logger.error(f"Error restarting {pending.script}: {e}")
+                    pending.schedule_restart()
+
+        if now >= next_stats:
+            log_child_stats()
+            next_stats = now + STATS_INTERVAL
+
+        if now >= next_health:
+            for child in children:
+                check_health(child)
+            next_health = now + HEALTH_CHECK_INTERVAL
+
+        if now >= next_metrics:
+            if metrics_file:
+                metrics.write_textfile(metrics_file)
+            next_metrics = now + METRICS_INTERVAL
+
 
 def main():
     """Main function with comprehensive error handling"""
-    global process_a, process_b
-    
+    global status_subscriber, status_publisher
     # Register signal handlers
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
-    
+
     logger.info("System Controller starting...")
-    
+
     # Check if required files exist
     if not check_script_files():
         logger.critical("Cannot start - missing required files")
         sys.exit(1)
-    
+
+    # Health reports from the children, and "down" notices to the LED controller
+    try:
+        status_subscriber = StatusSubscriber("supervisor")
+        threading.Thread(target=receive_status, name="status", daemon=True).start()
+        status_publisher = StatusPublisher("supervisor", subscribers=("led",))
+    except OSError as e:
+        logger.warning(f"Status bus unavailable, using process liveness only: {e}")
+
     try:
-        # Start both processes
-        logger.info("Starting weather display process...")
-        process_a = multiprocessing.Process(target=run_weather_display, name="WeatherDisplay")
-        
-        logger.info("Starting LED control process...")
-        process_b = multiprocessing.Process(target=run_led_controller, name="LEDController")
-        
-        process_a.start()
-        process_b.start()
-        
-        logger.info("Both processes started successfully")
-        
-        # Monitor processes
-        monitor_processes()
-        
+        for name, script, status_source in SERVICES:
+            child = Child(name, script, status_source)
+            children.append(child)
+            child.start()
+
+        logger.info("All processes started successfully")
+
+        # Supervise processes
+        supervise()
+
     except KeyboardInterrupt:
         logger.info("Program interrupted by user")
     except Exception as e:
         logger.error(f"Unexpected error in main: {e}")
     finally:
         terminate_processes()
+        if status_subscriber:
+            status_subscriber.close()
         logger.info("System Controller terminated")
 
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,28 @@
+"""Location resolution when the override or the location cache holds a malformed entry"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from fixtures import api_routes  # noqa: E402
+from asset_cache import AssetCache  # noqa: E402
+from data_client import DataClient, ReplaySession  # noqa: E402
+from location_cache import LocationCache  # noqa: E402
+from weather_service import WeatherService  # noqa: E402
+
+
+def make_service(tmp_path, override):
+    client = DataClient(10, session=ReplaySession(api_routes()))
+    location_cache = LocationCache(3600, path=str(tmp_path / "locations.json"), override=override)
+    return WeatherService(client, AssetCache(str(tmp_path / "assets")), "test", location_cache=location_cache)
+
+
+def test_override_is_used(tmp_path):
+    override = {"city": "ANKARA", "country": "TURKEY", "country_code": "TR", "lat": 39.93, "lon": 32.86}
+    assert make_service(tmp_path, override).get_location().city == "ANKARA"
+
+
+def test_malformed_override_falls_back_to_geolocation(tmp_path):
+    for override in ({"city": "ANKARA"}, {"city": "ANKARA", "country": "TURKEY", "country_code": "TR", "zip": 6}):
+        location = make_service(tmp_path, override).get_location()
+        assert (location.city, location.lat) == ("ISTANBUL", 41.01)
@@ -0,0 +1,46 @@
+"""SIGTERM, as sent by the supervisor and systemd, stops the display without losing buffered history"""
+import os
+import sys
+import time
+import signal
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from bench_startup import CHILD, write_fixtures  # noqa: E402
+from fixtures import REPO_DIR  # noqa: E402
+from weather_history import WeatherHistory, FLUSH_RECORDS  # noqa: E402
+
+
+def wait_for(path, text, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with open(path) as f:
+            if text in f.read():
+                return
+        time.sleep(0.05)
+    raise AssertionError(f"{text!r} not logged within {timeout}s")
+
+
+def test_sigterm_flushes_history(tmp_path):
+    fixtures = tmp_path / "fixtures"
+    fixtures.mkdir()
+    write_fixtures(str(fixtures))
+    env = dict(os.environ, HOME=str(tmp_path), SKYFORGE_DISPLAY="memory", SKYFORGE_HTTP_FIXTURES=str(fixtures),
+               SKYFORGE_RUN_DIR=str(tmp_path), SKYFORGE_METRICS_DIR=str(tmp_path / "no-metrics"))
+    env.pop("SKYFORGE_PROFILE_STARTUP", None)
+    log = tmp_path / "display.log"
+    with open(log, "w") as stderr:
+        process = subprocess.Popen([sys.executable, "-c", CHILD], cwd=REPO_DIR, env=env, stderr=stderr)
+        try:
+            # A first boot waits for the first refresh, which records one observation
+            wait_for(log, "First frame")
+            process.send_signal(signal.SIGTERM)
+            assert process.wait(timeout=30) == 0
+        finally:
+            if process.poll() is None:
+                process.kill()
+
+    assert "Program terminated" in log.read_text()
+    history = WeatherHistory(str(tmp_path / ".cache" / "skyforge" / "history.bin"))
+    assert 0 < len(history) < FLUSH_RECORDS  # Only ever buffered, so written by the shutdown flush
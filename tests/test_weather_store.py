@@ -0,0 +1,57 @@
+"""WeatherStore timestamps and snapshot writes against recorded responses"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from fixtures import api_routes  # noqa: E402
+from asset_cache import AssetCache  # noqa: E402
+from data_client import DataClient, ReplaySession  # noqa: E402
+from fetch_stage import FetchStage  # noqa: E402
+from location_cache import LocationCache  # noqa: E402
+from weather_service import WeatherService, WEATHER_API_URL, FORECAST_API_URL  # noqa: E402
+from weather_store import WeatherStore  # noqa: E402
+
+LOCATION = {"city": "ISTANBUL", "country": "TURKEY", "country_code": "TR", "lat": 41.01, "lon": 28.95}
+TTL = 0.05  # Seconds, so entries expire between refreshes
+
+
+def make_store(tmp_path, session, ttl=TTL):
+    client = DataClient(10, ttls={"weather": ttl, "forecast": ttl}, session=session)
+    location_cache = LocationCache(3600, path=str(tmp_path / "locations.json"), override=LOCATION)
+    service = WeatherService(client, AssetCache(str(tmp_path / "assets")), "test", location_cache=location_cache)
+    return WeatherStore(service, FetchStage(), path=str(tmp_path / "snapshot.json"))
+
+
+def test_expired_data_keeps_its_fetch_time(tmp_path):
+    session = ReplaySession(api_routes())
+    store = make_store(tmp_path, session)
+    store._refresh()
+    fetched = dict(store.updated)
+
+    # The host now throttles: the client answers from its expired entries
+    time.sleep(TTL * 2)
+    for url in (WEATHER_API_URL, FORECAST_API_URL):
+        session.routes[url] = (429, b"", {})
+    store._refresh()
+
+    assert store.values["weather"] is not None
+    for item in ("weather", "forecast", "hourly"):
+        assert store.updated[item] <= fetched[item]  # When the client fetched it, not this refresh
+    assert store.age() >= TTL * 2
+    store.fetch_stage.shutdown()
+
+
+def test_snapshot_written_only_for_new_data(tmp_path):
+    session = ReplaySession(api_routes())
+    store = make_store(tmp_path, session, ttl=60)
+    store._refresh()
+    snapshot = tmp_path / "snapshot.json"
+    assert snapshot.exists()
+
+    # Within the TTL every response comes from the cache: nothing new to write
+    snapshot.unlink()
+    store._refresh()
+    assert not snapshot.exists()
+    store.fetch_stage.shutdown()
@@ -0,0 +1,171 @@
+import logging
+import threading
+from collections import OrderedDict
+
+from PIL import Image, ImageChops, ImageDraw
+
+logger = logging.getLogger(__name__)
+
+# Cache settings
+SPRITE_CACHE_ENTRIES = 256  # Whole-string masks kept in RAM
+MEASURE_CACHE_ENTRIES = 512
+CLOCK_CHARSET = "0123456789:"
+NUMBER_CHARSET = "-0123456789"
+
+
+class GlyphAtlas:
+    """Coverage masks and advances for a fixed set of characters of one font, rasterized once"""
+
+    def __init__(self, font, charset):
+        self.font = font
+        self.charset = set(charset)
+        self.glyphs = {}
+        self.advances = {}
+        self._kerning = {}
+        for char in charset:
+            self.glyphs[char] = _rasterize(font, char)
+            self.advances[char] = font.getlength(char)
+
+    def covers(self, text):
+        return bool(text) and all(char in self.charset for char in text)
+
+    def kerning(self, left, right):
+        pair = left + right
+        if pair not in self._kerning:
+            self._kerning[pair] = self.font.getlength(pair) - self.advances[left] - self.advances[right]
+        return self._kerning[pair]
+
+    def bottom(self, text):
+        """Lowest row text reaches below the draw origin, as font.getbbox(text)[3]"""
+        return max(dy + mask.height for mask, (_, dy) in (self.glyphs[char] for char in text))
+
+    def positions(self, text):
+        """Pen x of every character, and the total advance"""
+        pen = 0.0
+        positions = []
+        previous = None
+        for char in text:
+            if previous is not None:
+                pen += self.kerning(previous, char)
+            positions.append(pen)
+            pen += self.advances[char]
+            previous = char
+        return positions, pen
+
+    def compose(self, text):
+        """Build the mask for text from glyph blits, without calling FreeType"""
+        positions, _ = self.positions(text)
+        boxes = []
+        for char, pen in zip(text, positions):
+            mask, (dx, dy) = self.glyphs[char]
+            boxes.append((mask, int(pen) + dx, dy))
+        left = min(x for _, x, _ in boxes)
+        top = min(y for _, _, y in boxes)
+        right = max(x + mask.width for mask, x, _ in boxes)
+        bottom = max(y + mask.height for mask, _, y in boxes)
+
+        composed = Image.new("L", (right - left, bottom - top))
+        for mask, x, y in boxes:
+            box = (x - left, y - top, x - left + mask.width, y - top + mask.height)
+            # FreeType keeps the maximum coverage where neighbouring glyphs overlap
+            composed.paste(ImageChops.lighter(composed.crop(box), mask), box[:2])
+        return composed, (left, top)
+
+
+class TextCache:
+    """Memoized text measurements and coverage-mask sprites for draw-time blits.
+
+    Strings are rasterized by FreeType once and kept in a bounded LRU. Strings
+    made only of characters in a font's glyph atlas (the clock digits) are
+    composed from pre-rasterized glyphs instead. Masks are colour independent;
+    the fill colour is applied when the sprite is blitted.
+    """
+
+    def __init__(self, max_sprites=SPRITE_CACHE_ENTRIES, max_measurements=MEASURE_CACHE_ENTRIES):
+        self.max_sprites = max_sprites
+        self.max_measurements = max_measurements
+        self.atlases = {}
+        self.stats = {"sprite_hits": 0, "composed": 0, "rasterized": 0}
+        self._sprites = OrderedDict()
+        self._measurements = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add_atlas(self, font, charset):
+        """Rasterize charset for font once; renderers sharing this cache ask again for nothing"""
+        atlas = self.atlases.get(font)
+        if atlas is None or not atlas.charset.issuperset(charset):
+            self.atlases[font] = GlyphAtlas(font, charset)
+
+    def warm(self, font, strings):
+        """Rasterize strings ahead of time, e.g. every weekday name"""
+        for text in strings:
+            self.sprite(font, text)
+
+    def bottom(self, font, text):
+        """Same as font.getbbox(text)[3], from the atlas when it covers text"""
+        atlas = self.atlases.get(font)
+        if atlas and atlas.covers(text):
+            return atlas.bottom(text)
+        return font.getbbox(text)[3]
+
+    def measure(self, font, text):
+        """Same as font.getlength(text), memoized"""
+        key = (font, text)
+        with self._lock:
+            if key in self._measurements:
+                self._measurements.move_to_end(key)
+                return self._measurements[key]
+
+        atlas = self.atlases.get(font)
+        if atlas and atlas.covers(text):
+            length = atlas.positions(text)[1]
+        else:
+            length = font.getlength(text)
+
+        with self._lock:
+            _remember(self._measurements, key, length, self.max_measurements)
+        return length
+
+    def sprite(self, font, text):
+        """Return (mask, (dx, dy)): the coverage mask and its offset from the draw origin"""
+        key = (font, text)
+        with self._lock:
+            sprite = self._sprites.get(key)
+            if sprite is not None:
+                self._sprites.move_to_end(key)
+                self.stats["sprite_hits"] += 1
+                return sprite
+
+        atlas = self.atlases.get(font)
+        if atlas and atlas.covers(text):
+            sprite = atlas.compose(text)
+            counter = "composed"
+        else:
+            sprite = _rasterize(font, text)
+            counter = "rasterized"
+
+        with self._lock:
+            self.stats[counter] += 1
+            _remember(self._sprites, key, sprite, self.max_sprites)
+        return sprite
+
+    def draw(self, image, xy, text, font, fill):
+        """Blit text onto image; equivalent to ImageDraw.text for integer coordinates"""
+        if not text:
+            return
+        mask, (dx, dy) = self.sprite(font, text)
+        image.paste(fill, (int(xy[0]) + dx, int(xy[1]) + dy), mask)
+
+
+def _rasterize(font, text):
+    left, top, right, bottom = font.getbbox(text)
+    mask = Image.new("L", (max(1, right - left), max(1, bottom - top)))
+    ImageDraw.Draw(mask).text((-left, -top), text, font=font, fill=255)
+    return mask, (left, top)
+
+
+def _remember(cache, key, value, limit):
+    cache[key] = value
+    cache.move_to_end(key)
+    while len(cache) > limit:
+        cache.popitem(last=False)
@@ -0,0 +1,82 @@
+import math
+import time
+import hashlib
+import logging
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Scheduler settings
+TICK_PERIOD = 60  # Seconds; the clock shows HH:MM
+TICK_OFFSET = 0.002  # Seconds past the boundary, so the new minute is already current on wake-up
+
+
+class MinuteTicker:
+    """Wall-clock tick boundaries, so the clock changes on the minute instead of drifting.
+
+    The delay is recomputed from the wall clock on every call, so work done
+    between ticks and clock adjustments (NTP) never accumulate.
+    """
+
+    def __init__(self, period=TICK_PERIOD, offset=TICK_OFFSET):
+        self.period = period
+        self.offset = offset
+
+    def delay(self):
+        """Seconds until just after the next boundary"""
+        now = time.time()
+        return (math.floor(now / self.period) + 1) * self.period - now + self.offset
+
+    def lateness(self):
+        """Seconds since the last boundary: how late the current wake-up is for its tick"""
+        return time.time() % self.period
+
+
+class FrameGate:
+    """Skips frames whose inputs hash the same as the last frame drawn.
+
+    Widget values are hashed with their images' pixels, so a frame is skipped
+    only when nothing visible could differ.
+    """
+
+    def __init__(self):
+        self.last_digest = None
+        self.drawn = 0
+        self.skipped = 0
+
+    def changed(self, values):
+        """True (and remember the inputs) if values differ from the last frame drawn"""
+        digest = content_hash(values)
+        if digest == self.last_digest:
+            self.skipped += 1
+            return False
+        self.last_digest = digest
+        self.drawn += 1
+        return True
+
+    def reset(self):
+        """Forget the last frame, e.g. when drawing it may not have completed"""
+        self.last_digest = None
+
+
+def content_hash(values):
+    digest = hashlib.blake2b(digest_size=16)
+    _feed(digest, values)
+    return digest.digest()
+
+
+def _feed(digest, value):
+    if isinstance(value, Image.Image):
+        digest.update(f"image:{value.mode}:{value.size}".encode())
+        digest.update(value.tobytes())
+    elif isinstance(value, dict):
+        for key in sorted(value):
+            digest.update(f"key:{key}".encode())
+            _feed(digest, value[key])
+    elif isinstance(value, (tuple, list)):
+        digest.update(f"seq:{len(value)}".encode())
+        for item in value:
+            _feed(digest, item)
+    else:
+        digest.update(f"{type(value).__name__}:{value!r}".encode())
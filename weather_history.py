@@ -0,0 +1,146 @@
+import os
+import mmap
+import time
+import struct
+import logging
+import threading
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# History settings
+HISTORY_PATH = os.path.expanduser("~/.cache/skyforge/history.bin")
+HISTORY_CAPACITY = 2016  # Observations kept: a week at one every 5 minutes
+FLUSH_RECORDS = 6  # Observations buffered in memory before they are written out together
+FLUSH_INTERVAL = 3600  # Seconds an observation may wait in memory before a write
+HISTORY_MAGIC = b"SKYHIST1"
+RECORD = np.dtype([
+    ("time", "<i8"),  # Observation time, Unix seconds
+    ("temperature", "<f4"),  # °C
+    ("humidity", "<f4"),  # %
+    ("pressure", "<f4"),  # hPa
+    ("condition", "<u4"),  # OpenWeatherMap condition id
+])
+
+
+class WeatherHistory:
+    """Fixed-size ring file of weather observations, memory-mapped as a NumPy record array.
+
+    Every record is stored twice, at slot i and i + capacity, so the newest n
+    records are always one contiguous slice: window() returns a view onto the
+    mapping without copying. New observations are buffered and written out
+    FLUSH_RECORDS at a time (or after FLUSH_INTERVAL), with one msync per batch.
+    """
+
+    HEADER = struct.Struct("<8sIIQ")  # Magic, capacity, record size, records written
+
+    def __init__(self, path=HISTORY_PATH, capacity=HISTORY_CAPACITY):
+        self.path = path
+        self.capacity = capacity
+        size = self.HEADER.size + 2 * capacity * RECORD.itemsize
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size != size:
+                os.ftruncate(fd, 0)  # Layout changed: start over
+                os.ftruncate(fd, size)
+            self.map = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        magic, capacity_in_file, record_size, count = self.HEADER.unpack_from(self.map, 0)
+        if (magic, capacity_in_file, record_size) != (HISTORY_MAGIC, capacity, RECORD.itemsize):
+            count = 0
+            self.HEADER.pack_into(self.map, 0, HISTORY_MAGIC, capacity, RECORD.itemsize, count)
+        self.records = np.frombuffer(self.map, dtype=RECORD, count=2 * capacity, offset=self.HEADER.size)
+        self.count = count
+        self._pending = []
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return min(self.count, self.capacity) + len(self._pending)
+
+    def append(self, timestamp, temperature, humidity, pressure, condition):
+        """Record an observation; repeats of the newest observation time are ignored"""
+        with self._lock:
+            if timestamp <= self._last_time():
+                return False
+            self._pending.append((int(timestamp), temperature, humidity, pressure, condition))
+            if len(self._pending) >= FLUSH_RECORDS or time.monotonic() - self._last_flush >= FLUSH_INTERVAL:
+                self._flush()
+            return True
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def window(self, seconds, now=None):
+        """Observations of the last seconds, oldest first.
+
+        A view onto the mapped file (live, not a copy) unless observations are
+        still waiting to be written, which are appended to a copy.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            records = self._recent()
+            if self._pending:
+                records = np.concatenate((records, np.array(self._pending, dtype=RECORD)))
+        start = np.searchsorted(records["time"], now - seconds, side="left")
+        return records[start:]
+
+    def summary(self, seconds, field="temperature", now=None):
+        """(min, max, mean) of field over the last seconds, or None if nothing was recorded"""
+        values = self.window(seconds, now)[field]
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return None
+        return float(values.min()), float(values.max()), float(values.mean())
+
+    def close(self):
+        self.flush()
+        del self.records
+        self.map.close()
+
+    def _recent(self):
+        """The newest written records, oldest first, as one slice of the mirrored ring"""
+        stored = min(self.count, self.capacity)
+        end = self.count % self.capacity + self.capacity
+        return self.records[end - stored:end]
+
+    def _last_time(self):
+        if self._pending:
+            return self._pending[-1][0]
+        if self.count:
+            return int(self.records[self.count % self.capacity + self.capacity - 1]["time"])
+        return 0
+
+    def _flush(self):
+        if not self._pending:
+            return
+        for record in self._pending:
+            slot = self.count % self.capacity
+            self.records[slot] = record
+            self.records[slot + self.capacity] = record
+            self.count += 1
+        self.HEADER.pack_into(self.map, 0, HISTORY_MAGIC, self.capacity, RECORD.itemsize, self.count)
+        try:
+            self.map.flush()
+        except OSError as e:
+            logger.warning(f"Could not write weather history {self.path}: {e}")
+        logger.info(f"Wrote {len(self._pending)} observations to {self.path}")
+        self._pending = []
+        self._last_flush = time.monotonic()
+
+
+if __name__ == "__main__":
+    import sys
+
+    # Summarise a history file, e.g. python3 weather_history.py ~/.cache/skyforge/history.bin
+    history = WeatherHistory(sys.argv[1] if len(sys.argv) > 1 else HISTORY_PATH)
+    print(f"{len(history)} observations")
+    for field in ("temperature", "humidity", "pressure"):
+        for hours in (24, 24 * 7):
+            stats = history.summary(hours * 3600, field)
+            if stats:
+                print(f"{field} {hours}h: min {stats[0]:.1f} max {stats[1]:.1f} mean {stats[2]:.1f}")
@@ -0,0 +1,390 @@
+import time
+import logging
+import threading
+from collections import namedtuple
+from datetime import datetime, timezone
+
+import requests
+
+from data_client import CachedResponse
+from forecast_days import DailyForecast
+
+logger = logging.getLogger(__name__)
+
+# API settings
+WEATHER_API_URL = "https://api.openweathermap.org/data/2.5/weather"
+FORECAST_API_URL = "https://api.openweathermap.org/data/2.5/forecast"
+GROUP_API_URL = "https://api.openweathermap.org/data/2.5/group"  # Current weather for several city ids
+GROUP_LIMIT = 20  # City ids the group endpoint accepts per request
+LOCATION_API_URL = "http://ip-api.com/json"
+LOCATION_FIELDS = "status,message,city,country,countryCode,lat,lon,timezone,query"
+FLAG_URL = "https://flagcdn.com/w80/{code}.png"
+ICON_URL = "http://openweathermap.org/img/wn/{code}@2x.png"
+
+# Asset sizes used by the layout
+FLAG_SIZE = (30, 20)
+ICON_SIZE = (60, 60)
+WEEKLY_ICON_SIZE = (30, 30)
+WEEKLY_SLOTS = 5  # Forecast cards that fit across the screen
+HOURLY_SLOTS = 8  # 3-hour forecast entries on the hourly page (24 hours)
+COMPASS_POINTS = ("N", "NE", "E", "SE", "S", "SW", "W", "NW")
+DATA_AGE_VISIBLE = 600  # Seconds before the age of the weather data is shown on screen
+
+# A resolved location; lat/lon are None only for snapshots written before coordinates were kept.
+# city_id is OpenWeatherMap's id, when known, for batched current weather lookups
+Location = namedtuple("Location", "city country country_code lat lon timezone city_id",
+                      defaults=(None, None, None, None))
+
+# Location errors replace the whole screen, keyed by the sentinel city name
+LOCATION_ERRORS = {
+    "TIMEOUT": "CONNECTION ERROR",
+    "NETWORK": "NETWORK ERROR",
+    "API": "API ERROR",
+    "UNKNOWN": "UNKNOWN ERROR",
+}
+
+
+class WeatherService:
+    """Location, weather, forecast and image lookups on top of the data client and asset cache"""
+
+    def __init__(self, data_client, asset_cache, api_key, location_cache=None, history=None, weather_group=None):
+        self.data_client = data_client
+        self.asset_cache = asset_cache
+        self.api_key = api_key
+        self.location_cache = location_cache
+        self.history = history
+        self.weather_group = weather_group
+        self.daily_forecast = DailyForecast()
+        self.cached = {}  # Item -> (fetched_at, expired) if its last response came from the cache, else None
+
+    def get_location(self):
+        """Resolve the location from the location cache, or by IP geolocation on a cache miss"""
+        if self.location_cache is not None:
+            cached = self.location_cache.lookup()
+            if cached:
+                try:
+                    return Location(**cached)
+                except TypeError as e:
+                    # A hand-written override or an old cache file with missing or unknown fields
+                    logger.warning(f"Ignoring malformed location {cached!r}: {e}")
+        try:
+            location_data = self.data_client.get_json("location", LOCATION_API_URL,
+                                                      params={"fields": LOCATION_FIELDS})
+            if location_data.get("status") == "fail":
+                logger.error(f"Location API error: {location_data.get('message')}")
+                return Location("API", "ERROR", "XX")
+
+            location = Location(
+                city=location_data.get("city", "Unknown").upper(),
+                country=location_data.get("country", "Unknown").upper(),
+                country_code=location_data.get("countryCode", "XX").upper(),
+                lat=location_data.get("lat"),
+                lon=location_data.get("lon"),
+                timezone=location_data.get("timezone"),
+            )
+            if self.location_cache is not None and location.lat is not None:
+                self.location_cache.store(location._asdict(), location_data.get("query"))
+            return location
+
+        except requests.exceptions.Timeout:
+            logger.error("Request timeout")
+            return Location("TIMEOUT", "ERROR", "XX")
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Network error: {e}")
+            return Location("NETWORK", "ERROR", "XX")
+        except Exception as e:
+            logger.error(f"Unexpected error: {e}")
+            return Location("UNKNOWN", "ERROR", "XX")
+
+    def _note_source(self, item, response):
+        if isinstance(response, CachedResponse):
+            self.cached[item] = (response.fetched_at, response.expired)
+        else:
+            self.cached[item] = None
+
+    def _query(self, location):
+        """Weather API parameters for a location: coordinates when known, else the city name"""
+        if location.lat is not None and location.lon is not None:
+            params = {"lat": f"{location.lat:.4f}", "lon": f"{location.lon:.4f}"}
+        else:
+            params = {"q": location.city}
+        return dict(params, appid=self.api_key, units="metric")
+
+    def get_current_weather(self, location):
+        try:
+            weather_data = None
+            if self.weather_group is not None:
+                try:
+                    weather_data = self.weather_group.get(location)
+                except requests.exceptions.RequestException as e:
+                    logger.warning(f"Group weather request failed, asking for {location.city} alone: {e}")
+            if weather_data is None:
+                weather_params = self._query(location)
+                weather_data = self.data_client.get_json("weather", WEATHER_API_URL, params=weather_params)
+                if self.weather_group is not None and "id" in weather_data:
+                    self.weather_group.add(location, weather_data["id"])
+            self._note_source("weather", weather_data)
+
+            weather = weather_data["weather"][0]["description"].upper()
+            temperature = f"{weather_data['main']['temp']:.1f}°C"
+            icon_code = weather_data["weather"][0]["icon"]
+            if self.history is not None:
+                self.record_observation(weather_data)
+
+            return weather, temperature, icon_code, weather_details(weather_data)
+
+        except requests.exceptions.Timeout:
+            logger.error("Weather request timeout")
+            return None
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Weather network error: {e}")
+            return None
+        except KeyError as e:
+            logger.error(f"API response error: {e}")
+            return None
+        except Exception as e:
+            logger.error(f"Unexpected weather error: {e}")
+            return None
+
+    def record_observation(self, weather_data):
+        """Add a current weather response to the history; cached repeats of it are skipped"""
+        main = weather_data["main"]
+        self.history.append(
+            weather_data.get("dt", int(time.time())),
+            main["temp"],
+            main.get("humidity", float("nan")),
+            main.get("pressure", float("nan")),
+            weather_data["weather"][0].get("id", 0),
+        )
+
+    def get_weekly_weather(self, location):
+        try:
+            forecast_params = self._query(location)
+            forecast_data = self.data_client.get_json("forecast", FORECAST_API_URL, params=forecast_params)
+            self._note_source("forecast", forecast_data)
+
+            weekly_data = []
+            for day in self.daily_forecast.days(forecast_data):
+                # The renderer drops the low when the pair is too wide for its card
+                weekly_data.append((day.name, f"{round(day.high)}/{round(day.low)}", day.icon))
+
+            return weekly_data[:7]
+        except Exception as e:
+            logger.error(f"Weekly forecast error: {e}")
+            return []
+
+    def get_hourly_weather(self, location):
+        """The next HOURLY_SLOTS forecast entries as (time, temperature, icon, chance of rain)"""
+        try:
+            # Same request as get_weekly_weather(): served by the data client's cache or coalesced with it
+            forecast_params = self._query(location)
+            forecast_data = self.data_client.get_json("forecast", FORECAST_API_URL, params=forecast_params)
+            self._note_source("hourly", forecast_data)
+
+            offset = forecast_data.get("city", {}).get("timezone", 0)  # Seconds from UTC at the location
+            hourly_data = []
+            for entry in forecast_data.get("list", [])[:HOURLY_SLOTS]:
+                try:
+                    hour = datetime.fromtimestamp(entry["dt"] + offset, timezone.utc).strftime("%H:%M")
+                    temp = f"{entry['main']['temp']:.0f}°C"
+                    icon = entry["weather"][0]["icon"]
+                    rain = f"{round(entry.get('pop', 0) * 100)}%"
+                    hourly_data.append((hour, temp, icon, rain))
+                except (KeyError, IndexError) as e:
+                    logger.warning(f"Hourly data processing error: {e}")
+                    continue
+
+            return hourly_data
+        except Exception as e:
+            logger.error(f"Hourly forecast error: {e}")
+            return []
+
+    def download_asset(self, endpoint, url, description):
+        """Download raw image bytes, or None if the server does not have the asset"""
+        data = self.data_client.get_bytes(endpoint, url)
+        if data is None:
+            logger.warning(f"{description} not found")
+        return data
+
+    def fetch_country_flag(self, country_code):
+        try:
+            code = country_code.lower()
+            flag_url = FLAG_URL.format(code=code)
+            return self.asset_cache.get(
+                "flag", code, FLAG_SIZE,
+                lambda: self.download_asset("flag", flag_url, f"Flag for country {country_code}")
+            )
+        except Exception as e:
+            logger.error(f"Error fetching flag: {e}")
+            return None
+
+    def fetch_weather_icon(self, icon_code, size=(50, 50)):
+        try:
+            icon_url = ICON_URL.format(code=icon_code)
+            return self.asset_cache.get(
+                "icon", icon_code, size,
+                lambda: self.download_asset("icon", icon_url, f"Weather icon {icon_code}")
+            )
+        except Exception as e:
+            logger.error(f"Error fetching icon: {e}")
+            return None
+
+    def cached_assets(self, values):
+        """Flag and icons for already known values, from the asset cache only (no network)"""
+        flag = None
+        icons = {}
+        if values.get("location"):
+            flag = self.asset_cache.peek("flag", values["location"].country_code.lower(), FLAG_SIZE)
+        wanted = []
+        if values.get("weather"):
+            wanted.append((values["weather"][2], ICON_SIZE))
+        for _, _, icon in (values.get("forecast") or [])[:WEEKLY_SLOTS]:
+            wanted.append((icon, WEEKLY_ICON_SIZE))
+        for _, _, icon, _ in values.get("hourly") or []:
+            wanted.append((icon, WEEKLY_ICON_SIZE))
+        for code, size in wanted:
+            image = self.asset_cache.peek("icon", code, size)
+            if image is not None:
+                icons[(code, size)] = image
+        return flag, icons
+
+    def fetch_frame(self, fetch_stage, get_location=None):
+        """Run the fetch stage for one frame: location first, then everything else in parallel"""
+        return fetch_stage.run(
+            get_location or self.get_location,
+            self.get_current_weather,
+            self.get_weekly_weather,
+            lambda location: self.fetch_country_flag(location.country_code),
+            self.fetch_weather_icon,
+            weather_icons=lambda current: [(current[2], ICON_SIZE)],
+            forecast_icons=lambda weekly: [(icon, WEEKLY_ICON_SIZE) for _, _, icon in weekly[:WEEKLY_SLOTS]],
+            fetch_hourly=self.get_hourly_weather,
+            hourly_icons=lambda hourly: [(icon, WEEKLY_ICON_SIZE) for _, _, icon, _ in hourly],
+        )
+
+
+class WeatherGroup:
+    """Current weather for many locations with one request per GROUP_LIMIT cities.
+
+    Every lookup asks the shared data client for the group of all known city
+    ids, so the first location to refresh fetches for all of them and the
+    others are served from the data client's cache or coalesced with the
+    request in flight. A location joins the group once its city id is known,
+    from its config or from its first single lookup.
+    """
+
+    def __init__(self, data_client, api_key):
+        self.data_client = data_client
+        self.api_key = api_key
+        self.city_ids = {}  # (lat, lon) or city -> OpenWeatherMap city id
+        self._lock = threading.Lock()
+
+    def add(self, location, city_id):
+        with self._lock:
+            self.city_ids[_location_key(location)] = city_id
+
+    def get(self, location):
+        """The current weather response for location, or None if its city id is not known yet"""
+        with self._lock:
+            city_id = location.city_id or self.city_ids.get(_location_key(location))
+            if city_id is None:
+                return None
+            ids = sorted(set(self.city_ids.values()) | {city_id})
+        start = ids.index(city_id) // GROUP_LIMIT * GROUP_LIMIT
+        group = ids[start:start + GROUP_LIMIT]
+        params = {"id": ",".join(str(i) for i in group), "appid": self.api_key, "units": "metric"}
+        group_data = self.data_client.get_json("weather", GROUP_API_URL, params=params)
+        for weather_data in group_data.get("list", []):
+            if weather_data.get("id") == city_id:
+                if isinstance(group_data, CachedResponse):
+                    return CachedResponse(weather_data, group_data.fetched_at, group_data.expired)
+                return weather_data
+        return None
+
+
+def _location_key(location):
+    if location.lat is not None and location.lon is not None:
+        return (round(location.lat, 2), round(location.lon, 2))
+    return location.city
+
+
+def weather_details(weather_data):
+    """Humidity, wind, pressure, sunrise and sunset from a current weather response, as display text"""
+    main = weather_data.get("main", {})
+    wind = weather_data.get("wind", {})
+    sun = weather_data.get("sys", {})
+    offset = weather_data.get("timezone", sun.get("timezone", 0))  # Seconds from UTC at the location
+
+    def local_time(timestamp):
+        if timestamp is None:
+            return "--:--"
+        return datetime.fromtimestamp(timestamp + offset, timezone.utc).strftime("%H:%M")
+
+    wind_text = "--"
+    if "speed" in wind:
+        wind_text = f"{wind['speed']:.1f} M/S"
+        if "deg" in wind:
+            wind_text += f" {COMPASS_POINTS[round(wind['deg'] / 45) % 8]}"
+    return {
+        "humidity": f"{main['humidity']}%" if "humidity" in main else "--",
+        "wind": wind_text,
+        "pressure": f"{main['pressure']} HPA" if "pressure" in main else "--",
+        "sunrise": local_time(sun.get("sunrise")),
+        "sunset": local_time(sun.get("sunset")),
+    }
+
+
+def format_age(seconds):
+    """Short on-screen label for old data, or an empty string while it is fresh"""
+    if seconds is None or seconds < DATA_AGE_VISIBLE:
+        return ""
+    if seconds < 3600:
+        return f"{int(seconds // 60)}M AGO"
+    if seconds < 86400:
+        return f"{int(seconds // 3600)}H AGO"
+    return f"{int(seconds // 86400)}D AGO"
+
+
+def widget_values(frame, now, seconds=False):
+    """Map a fetched frame and the current time to renderer widget values, with placeholders"""
+    city, country = frame["location"].city, frame["location"].country
+    weather, temperature, icon_code = (frame["weather"] or ("NO DATA", "--.-°C", None))[:3]
+    age = format_age(frame.get("weather_age")) if frame["weather"] else ""
+    weekly_data = frame["forecast"] or []
+    return {
+        "date": now.strftime("%d %B %Y").upper(),
+        "day": now.strftime("%A").upper(),
+        "clock": now.strftime("%H:%M:%S" if seconds else "%H:%M"),
+        "location": (city, country),
+        "flag": frame["flag"],
+        "conditions": (weather, temperature, frame["icons"].get((icon_code, ICON_SIZE)), age),
+        "forecast": tuple(
+            (day, temp, frame["icons"].get((icon, WEEKLY_ICON_SIZE)))
+            for day, temp, icon in weekly_data[:WEEKLY_SLOTS]
+        ),
+    }
+
+
+def hourly_values(frame):
+    """Values for the hourly forecast page"""
+    return {
+        "title": "NEXT 24 HOURS",
+        "rows": tuple(
+            (hour, temp, frame["icons"].get((icon, WEEKLY_ICON_SIZE)), rain)
+            for hour, temp, icon, rain in (frame.get("hourly") or [])[:HOURLY_SLOTS]
+        ),
+    }
+
+
+def details_values(frame):
+    """Values for the weather details page; snapshots from before details were kept show placeholders"""
+    weather = frame["weather"]
+    details = weather[3] if weather and len(weather) > 3 else {}
+    return {
+        "title": frame["location"].city,
+        "rows": tuple(
+            (label, details.get(key, "--"))
+            for label, key in (("HUMIDITY", "humidity"), ("WIND", "wind"), ("PRESSURE", "pressure"),
+                               ("SUNRISE", "sunrise"), ("SUNSET", "sunset"))
+        ),
+    }
@@ -0,0 +1,202 @@
+import os
+import json
+import time
+import logging
+import threading
+
+from weather_service import LOCATION_ERRORS, Location
+
+logger = logging.getLogger(__name__)
+
+# Store settings
+SNAPSHOT_PATH = os.path.expanduser("~/.cache/skyforge/snapshot.json")
+REFRESH_INTERVAL = 60  # Seconds between background refreshes while the network is healthy
+BACKOFF_BASE = 15  # Seconds before the first retry after a failed refresh, doubled per failure
+BACKOFF_MAX = 900
+SNAPSHOT_ITEMS = ("location", "weather", "forecast", "hourly")
+METRIC_STAGES = {"location": "location", "weather": "weather", "forecast": "forecast", "hourly": "forecast",
+                 "flag": "asset", "icon": "asset"}
+
+
+class WeatherStore:
+    """Last good location, weather and forecast, served at once and refreshed in the background.
+
+    Readers always get the newest good values together with their age, never an
+    error sentinel. Refreshes run on their own thread and cadence through the
+    fetch stage; failed refreshes are retried with exponential backoff. Every refresh
+    that brings new data is written to an on-disk snapshot so a restart can paint
+    a full screen before the first network round trip.
+    """
+
+    def __init__(self, weather_service, fetch_stage, path=SNAPSHOT_PATH, refresh_interval=REFRESH_INTERVAL,
+                 metrics=None, trace=None, changed=None):
+        self.weather_service = weather_service
+        self.fetch_stage = fetch_stage
+        self.metrics = metrics
+        self.trace = trace
+        self.path = path
+        self.refresh_interval = refresh_interval
+        self.values = dict.fromkeys(SNAPSHOT_ITEMS)
+        self.updated = {}  # Wall-clock time each item was last fetched successfully
+        self.flag = None
+        self.icons = {}
+        self.missing = []  # Items the last refresh could not fetch
+        self.failures = 0  # Consecutive failed refreshes
+        self.last_error = None
+        self.changed = changed or threading.Event()  # Set whenever a refresh finishes; stores may share one
+        self._next_refresh = 0.0
+        self._location_error = None
+        self._running = False
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        """Restore the snapshot from disk, with whatever images are already in the asset cache"""
+        try:
+            with open(self.path) as f:
+                snapshot = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable snapshot {self.path}: {e}")
+            return
+
+        for item in SNAPSHOT_ITEMS:
+            value = snapshot.get(item)
+            if value is None:
+                continue
+            if item in ("forecast", "hourly"):
+                self.values[item] = [tuple(card) for card in value]
+            elif item == "location":
+                self.values[item] = Location(*value)
+            else:
+                self.values[item] = tuple(value)
+            self.updated[item] = snapshot.get("updated", {}).get(item, 0)
+        self.flag, self.icons = self.weather_service.cached_assets(self.values)
+        logger.info(f"Loaded snapshot from {self.path} ({self.age():.0f}s old)")
+
+    def save(self):
+        """Write the snapshot atomically, so a power cut never leaves half a file"""
+        snapshot = dict(self.values, updated=self.updated, saved=time.time())
+        tmp_path = f"{self.path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(tmp_path, "w") as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Could not write snapshot {self.path}: {e}")
+
+    def has_data(self):
+        return self.values["location"] is not None
+
+    def age(self):
+        """Seconds since the oldest item held was fetched, or None if there is none"""
+        with self._lock:
+            times = [self.updated[item] for item in SNAPSHOT_ITEMS if item in self.updated]
+        if not times:
+            return None
+        return max(0.0, time.time() - min(times))
+
+    def start(self):
+        """Refresh on the store's own cadence from a background thread"""
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        self._stop.set()
+
+    def wait(self, timeout):
+        """Sleep until a refresh finishes or timeout passes; returns True if one finished"""
+        finished = self.changed.wait(timeout)
+        self.changed.clear()
+        return finished
+
+    def frame(self):
+        """The newest good values in the same shape as a fetch stage frame"""
+        with self._lock:
+            return {
+                "location": self.values["location"],
+                "weather": self.values["weather"],
+                "forecast": self.values["forecast"],
+                "hourly": self.values["hourly"],
+                "flag": self.flag,
+                "icons": dict(self.icons),
+                "missing": list(self.missing),
+                "weather_age": time.time() - self.updated["weather"] if "weather" in self.updated else None,
+            }
+
+    def _run(self):
+        while self._running:
+            delay = self._next_refresh - time.monotonic()
+            if delay > 0 and self._stop.wait(delay):
+                break
+            self._refresh()
+
+    def _location(self):
+        """Look up the location, falling back to the last good one when the lookup fails"""
+        location = self.weather_service.get_location()
+        if location.city in LOCATION_ERRORS:
+            self._location_error = f"{location.city} - {LOCATION_ERRORS[location.city]}"
+            if self.values["location"] is not None:
+                return self.values["location"]
+            return None
+        return location
+
+    def _refresh(self):
+        self._location_error = None
+        try:
+            frame = self.weather_service.fetch_frame(self.fetch_stage, get_location=self._location)
+        except Exception as e:
+            logger.error(f"Refresh failed: {e}")
+            frame = {"location": None, "weather": None, "forecast": None, "hourly": None, "flag": None,
+                     "icons": {}, "missing": list(SNAPSHOT_ITEMS), "spans": []}
+
+        now = time.time()
+        # An empty forecast is an error too, and never replaces a good one
+        failed = self._location_error is not None or not all(frame[item] for item in SNAPSHOT_ITEMS)
+        changed = False
+        with self._lock:
+            for item in SNAPSHOT_ITEMS:
+                if frame[item] and not (item == "location" and self._location_error):
+                    cached = self.weather_service.cached.get(item)
+                    # The snapshot is only rewritten for new values or data fresh from upstream, not
+                    # for the same cached responses every refresh
+                    if frame[item] != self.values[item] or (item != "location" and cached is None):
+                        changed = True
+                    self.values[item] = frame[item]
+                    # Data the client served from an expired cache entry keeps its real age
+                    self.updated[item] = cached[0] if cached and cached[1] else now
+            if frame["flag"] is not None:
+                self.flag = frame["flag"]
+            self.icons.update(frame["icons"])
+            self.missing = frame["missing"]
+
+            if failed:
+                self.failures += 1
+                self.last_error = self._location_error or "DATA UNAVAILABLE"
+                delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (self.failures - 1))
+                logger.warning(f"Refresh incomplete ({self.failures} in a row), retrying in {delay}s")
+            else:
+                self.failures = 0
+                self.last_error = None
+                delay = self.refresh_interval
+            self._next_refresh = time.monotonic() + delay
+
+        if changed:
+            self.save()
+        self._record(frame, failed)
+        self.changed.set()
+
+    def _record(self, frame, failed):
+        """Fetch latencies into the metrics histograms and the span trace"""
+        if self.metrics is not None:
+            for kind, _, duration in frame["spans"]:
+                self.metrics.observe("stage_seconds", duration, stage=METRIC_STAGES[kind])
+            self.metrics.inc("refreshes_total", result="failed" if failed else "ok")
+        if self.trace is not None:
+            self.trace.record("refresh", frame["spans"], missing=len(frame["missing"]), failures=self.failures)